@@ -1,8 +1,12 @@
 # auth_routes_v3.py
 from __future__ import annotations
 
-import os
-from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import (
@@ -13,47 +17,57 @@ from fastapi import (
     Request,
     Response,
 )
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
-from jose import JWTError, jwt
+import bcrypt
+from cachetools import TTLCache
+import jwt
+import orjson
+from jwt import PyJWTError
 from sqlalchemy.orm import Session
 from sqlalchemy import select, or_
 
-from db import get_db
+from config import get_settings
+from db import AsyncSessionLocal, get_db
 from models import User
 
 
 # =========================================================
 # CONFIGURACOES JWT
 # =========================================================
-SECRET_KEY = os.getenv("SECRET_KEY", "troque-esta-chave-em-producao")
+settings = get_settings()
+
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
-REMEMBER_ME_EXPIRE_DAYS = int(os.getenv("REMEMBER_ME_EXPIRE_DAYS", "30"))
+# chave já em bytes: evita re-encodar a string a cada encode/decode
+SIGNING_KEY = settings.SECRET_KEY.encode("utf-8")
+
+
+def _b64url(raw: bytes) -> bytes:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+
+# header do JWT é sempre o mesmo: serializado/codificado uma vez só
+_JWT_HEADER = _b64url(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"})) + b"."
 
-ACCESS_COOKIE_NAME = os.getenv("ACCESS_COOKIE_NAME", "access_token")
-COOKIE_SECURE = os.getenv("COOKIE_SECURE", "false").lower() in ("1", "true", "yes")
-COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN")  # ex.: ".seudominio.com"
+# parte fixa do Set-Cookie do token, montada uma vez; por request só
+# entram valor e Max-Age
+COOKIE_ATTRS = (
+    "; HttpOnly; Path=/"
+    + ("; SameSite=None; Secure" if settings.COOKIE_SECURE else "; SameSite=Lax")
+    + (f"; Domain={settings.COOKIE_DOMAIN}" if settings.COOKIE_DOMAIN else "")
+)
 
 
 # =========================================================
 # SENHAS (bcrypt)
 # =========================================================
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    # levanta ValueError se `hashed` não for um hash bcrypt
+    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
 
-# =========================================================
-# SECURITY BEARER
-# =========================================================
-security = HTTPBearer(auto_error=False)
 
 router = APIRouter(prefix="/v3/auth", tags=["Auth v3"])
 
@@ -83,14 +97,97 @@ class UserMe(BaseModel):
     tipo: str
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Cópia leve do User autenticado, devolvida por get_current_user_v3.
+    Não é objeto ORM: pode ficar em cache entre requests sem depender
+    da Session que o carregou.
+    """
+    user_id: int
+    owner_id: int
+    email: Optional[str]
+    username: Optional[str]
+    nome: Optional[str]
+    tipo: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            user_id=user.user_id,
+            owner_id=user.owner_id,
+            email=user.email,
+            username=user.username,
+            nome=user.nome,
+            tipo=user.tipo,
+        )
+
+
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=settings.USER_CACHE_TTL_SECONDS)
+# get_current_user_v3 roda no threadpool e o TTLCache não é thread-safe
+_user_cache_lock = threading.Lock()
+
+
 # =========================================================
 # JWT UTILS
 # =========================================================
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=60))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    """
+    Gera JWT HS256 direto (header pré-codificado + HMAC-SHA256), sem passar
+    pelo jwt.encode. A validação continua no PyJWT (decode_access_token).
+
+    auth_time (momento do login) é o agora, a menos que venha em `data`
+    (o /refresh repassa o do token original).
+    """
+    now = int(datetime.now(timezone.utc).timestamp())
+    expire = now + int((expires_delta or timedelta(minutes=60)).total_seconds())
+    # iat permite que o /refresh preserve a duração original do token
+    payload = _b64url(orjson.dumps({"auth_time": now, **data, "iat": now, "exp": expire}))
+    signing_input = _JWT_HEADER + payload
+    signature = _b64url(hmac.new(SIGNING_KEY, signing_input, hashlib.sha256).digest())
+    return (signing_input + b"." + signature).decode("ascii")
+
+
+def decode_access_token(token: str) -> dict:
+    """Valida assinatura e exp; levanta PyJWTError se inválido."""
+    return jwt.decode(
+        token,
+        SIGNING_KEY,
+        algorithms=[ALGORITHM],
+        options={"require": ["exp", "sub"]},
+    )
+
+
+def extract_token(request: Request) -> Optional[str]:
+    """
+    Token do cookie OU do header Authorization: Bearer.
+
+    Lido direto do request (sem a dependência HTTPBearer): o header só é
+    consultado quando não há cookie, que é o caso comum do front.
+    """
+    token: Optional[str] = request.cookies.get(settings.ACCESS_COOKIE_NAME)
+
+    if not token:
+        auth = request.headers.get("authorization")
+        if auth and auth[:7].lower() == "bearer ":
+            token = auth[7:].strip() or None
+
+    return token
+
+
+def set_access_cookie(response: Response, token: str, expires: timedelta) -> None:
+    response.headers.append(
+        "set-cookie",
+        f"{settings.ACCESS_COOKIE_NAME}={token}; Max-Age={int(expires.total_seconds())}{COOKIE_ATTRS}",
+    )
+
+
+def clear_access_cookie(response: Response) -> None:
+    response.headers.append(
+        "set-cookie",
+        f'{settings.ACCESS_COOKIE_NAME}=""; Max-Age=0'
+        f"; Expires=Thu, 01 Jan 1970 00:00:00 GMT{COOKIE_ATTRS}",
+    )
 
 
 # =========================================================
@@ -123,7 +220,7 @@ def authenticate_user(db: Session, identifier: str, password: str) -> Optional[U
     try:
         if verify_password(password, stored):
             return user
-    except UnknownHashError:
+    except ValueError:
         # fallback: texto puro (apenas se ainda estiver usando hash antigo)
         if password == stored:
             return user
@@ -135,24 +232,21 @@ def authenticate_user(db: Session, identifier: str, password: str) -> Optional[U
 # =========================================================
 # DEPENDÊNCIA get_current_user_v3
 # =========================================================
-async def get_current_user_v3(
+def get_current_user_v3(
     request: Request,
     db: Session = Depends(get_db),
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-) -> User:
+) -> CurrentUser:
     """
     1. Lê token do cookie OU do header Authorization: Bearer
     2. Decodifica e valida
-    3. Busca user no DB
-    4. Retorna User ORM
-    """
+    3. Busca user no cache (por sub) ou no DB
+    4. Guarda em request.state.user e retorna CurrentUser (cópia leve, não ORM)
 
-    # token via cookie
-    token: Optional[str] = request.cookies.get(ACCESS_COOKIE_NAME)
+    É `def` (não async) de propósito: o FastAPI roda no threadpool e a
+    consulta síncrona ao banco não bloqueia o event loop.
+    """
 
-    # token via header Authorization
-    if not token and credentials and credentials.scheme.lower() == "bearer":
-        token = credentials.credentials
+    token = extract_token(request)
 
     if not token:
         raise HTTPException(
@@ -162,25 +256,72 @@ async def get_current_user_v3(
         )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         sub = payload.get("sub")
         if not sub:
             raise HTTPException(status_code=401, detail="Token inválido (sem 'sub').")
-    except JWTError:
+    except PyJWTError:
         raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
 
-    user = get_user_by_identifier(db, sub)
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado.")
+    with _user_cache_lock:
+        user = _user_cache.get(sub)
+
+    if user is None:
+        db_user = get_user_by_identifier(db, sub)
+        if not db_user:
+            raise HTTPException(status_code=401, detail="Usuário não encontrado.")
+
+        user = CurrentUser.from_user(db_user)
+        with _user_cache_lock:
+            _user_cache[sub] = user
 
+    # disponível para routers que usam a dependência em `dependencies=`
+    request.state.user = user
+    # a Session do request (get_db é cacheado por request) passa a filtrar
+    # as cargas de relacionamento pelo owner (ver models.py)
+    db.info["owner_id"] = user.owner_id
     return user
 
 
+async def get_async_db_do_owner(
+    current_user: CurrentUser = Depends(get_current_user_v3),
+):
+    """
+    get_async_db para rotas autenticadas: a AsyncSession já sai com
+    info["owner_id"] do usuário, então as cargas de relacionamento nela
+    também são filtradas pelo owner (ver models.py), como na Session
+    síncrona de get_current_user_v3.
+    """
+    async with AsyncSessionLocal() as db:
+        db.info["owner_id"] = current_user.owner_id
+        yield db
+
+
+def require_entregador(
+    current_user: CurrentUser = Depends(get_current_user_v3),
+) -> CurrentUser:
+    """
+    get_current_user_v3 + exige tipo ENTREGADOR (403 caso contrário).
+
+    Declare antes do Depends da sessão da rota: o FastAPI resolve as
+    dependências na ordem da assinatura, então o 403 sai sem abrir a
+    sessão/conexão do handler.
+    """
+    if (current_user.tipo or "").upper() != "ENTREGADOR":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas usuários ENTREGADOR podem registrar entrega.",
+        )
+    return current_user
+
+
 # =========================================================
 # AUTH ROUTES
 # =========================================================
+# login é `def`: bcrypt + consulta síncrona rodam no threadpool,
+# sem travar o event loop
 @router.post("/token", response_model=Token)
-async def login_return_token(
+def login_return_token(
     login_payload: LoginPayload,
     db: Session = Depends(get_db),
 ):
@@ -189,7 +330,7 @@ async def login_return_token(
         raise HTTPException(status_code=401, detail="Login ou senha incorretos.")
 
     subject = user.email or user.username
-    expires = timedelta(days=REMEMBER_ME_EXPIRE_DAYS) if login_payload.remember else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expires = timedelta(days=settings.REMEMBER_ME_EXPIRE_DAYS) if login_payload.remember else timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     access_token = create_access_token(data={"sub": subject}, expires_delta=expires)
 
@@ -197,7 +338,7 @@ async def login_return_token(
 
 
 @router.post("/login")
-async def login_set_cookie(
+def login_set_cookie(
     login_payload: LoginPayload,
     response: Response,
     db: Session = Depends(get_db),
@@ -208,21 +349,10 @@ async def login_set_cookie(
 
     subject = user.email or user.username
 
-    expires = timedelta(days=REMEMBER_ME_EXPIRE_DAYS) if login_payload.remember else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expires = timedelta(days=settings.REMEMBER_ME_EXPIRE_DAYS) if login_payload.remember else timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     token = create_access_token(data={"sub": subject}, expires_delta=expires)
-    samesite = "None" if COOKIE_SECURE else "Lax"
-
-    response.set_cookie(
-        key=ACCESS_COOKIE_NAME,
-        value=token,
-        httponly=True,
-        secure=COOKIE_SECURE,
-        samesite=samesite,
-        max_age=int(expires.total_seconds()),
-        path="/",
-        domain=COOKIE_DOMAIN,
-    )
+    set_access_cookie(response, token, expires)
 
     return {
         "ok": True,
@@ -237,16 +367,83 @@ async def login_set_cookie(
     }
 
 
-@router.post("/logout")
-async def logout(response: Response):
-    response.delete_cookie(
-        key=ACCESS_COOKIE_NAME,
-        path="/",
-        domain=COOKIE_DOMAIN,
+@router.post("/refresh")
+async def refresh_token(request: Request, response: Response):
+    """
+    Renova o token atual sem passar pelo bcrypt nem pelo banco.
+
+    Os clientes devem chamar esta rota antes do token expirar, em vez de
+    refazer o login: a verificação de senha (bcrypt) só acontece no
+    /token ou /login.
+    - Lê o token do cookie OU do header Authorization: Bearer
+    - Token do cookie: só o cookie é renovado e o corpo NÃO traz o token
+      (como no /login), para que o cookie HttpOnly nunca vire um token
+      legível por JS de outra origem
+    - Token do header: devolve o novo token no corpo (como no /token)
+    - Mantém a duração original (exp - iat), sem passar de
+      auth_time + MAX_SESSION_DAYS; depois disso responde 401
+    """
+    from_cookie = bool(request.cookies.get(settings.ACCESS_COOKIE_NAME))
+    token = extract_token(request)
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Token ausente",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    try:
+        payload = decode_access_token(token)
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
+
+    sub = payload.get("sub")
+    if not sub:
+        raise HTTPException(status_code=401, detail="Token inválido (sem 'sub').")
+
+    iat = payload.get("iat")
+    exp = payload.get("exp")
+    if iat is not None and exp is not None:
+        expires = timedelta(seconds=int(exp) - int(iat))
+    else:
+        expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    # tokens emitidos antes do claim auth_time: conta a partir do iat
+    now = int(datetime.now(timezone.utc).timestamp())
+    auth_time = int(payload.get("auth_time") or iat or now)
+    restante = auth_time + settings.MAX_SESSION_DAYS * 86400 - now
+    if restante <= 0:
+        raise HTTPException(status_code=401, detail="Sessão expirada. Faça login novamente.")
+    expires = min(expires, timedelta(seconds=restante))
+
+    access_token = create_access_token(
+        data={"sub": sub, "auth_time": auth_time},
+        expires_delta=expires,
     )
+
+    if from_cookie:
+        set_access_cookie(response, access_token, expires)
+        return {"ok": True}
+
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/logout")
+async def logout(request: Request, response: Response):
+    token = extract_token(request)
+    if token:
+        try:
+            payload = decode_access_token(token)
+        except PyJWTError:
+            payload = {}
+
+        with _user_cache_lock:
+            _user_cache.pop(payload.get("sub"), None)
+
+    clear_access_cookie(response)
     return {"ok": True}
 
 
 @router.get("/me", response_model=UserMe)
-async def read_me(current_user: User = Depends(get_current_user_v3)):
+async def read_me(current_user: CurrentUser = Depends(get_current_user_v3)):
     return current_user
@@ -1,20 +1,28 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from typing import Optional, List
 from pydantic import BaseModel, Field
+from sqlalchemy import Float, bindparam, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from enum import Enum
 
 from db import get_db
-from auth_routes import get_current_user_v3
-from models import Cliente, Owner, User
+from auth_routes import CurrentUser, get_async_db_do_owner, get_current_user_v3
+from models import Cliente
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 
-br_tz = pytz.timezone("America/Sao_Paulo")
+br_tz = ZoneInfo("America/Sao_Paulo")
 
-router = APIRouter(prefix="/v3/cliente", tags=["Cliente"])
+# autenticação no nível do router: get_current_user_v3 roda uma vez por
+# request e deixa o usuário em request.state.user
+router = APIRouter(
+    prefix="/v3/cliente",
+    tags=["Cliente"],
+    dependencies=[Depends(get_current_user_v3)],
+)
 
 
 # =========================================================
@@ -107,6 +115,34 @@ class ClientePatch(BaseModel):
     ativo: Optional[bool] = None
 
 
+class ClientePage(BaseModel):
+    """
+    Página da listagem (paginação por cursor/keyset).
+    Para a próxima página, envie next_cursor como ?cursor=;
+    next_cursor = None indica que não há mais itens.
+    """
+    items: List[ClienteOut]
+    next_cursor: Optional[int] = None
+
+
+# colunas lidas pelas listagens: exatamente os campos do ClienteOut.
+# Os preços são NUMERIC no banco e float no schema: o cast no SELECT já
+# entrega o tipo certo, o que permite montar o ClienteOut sem validação.
+CLIENTE_OUT_COLUMNS = tuple(
+    cast(getattr(Cliente, campo), Float).label(campo)
+    if campo.startswith("preco_")
+    else getattr(Cliente, campo)
+    for campo in ClienteOut.model_fields
+)
+
+# busca de um cliente do owner: statement único, montado uma vez, com os
+# valores entrando como bind params (PATCH e DELETE compartilham)
+CLIENTE_DO_OWNER_STMT = select(Cliente).where(
+    Cliente.id_cliente == bindparam("id_cliente"),
+    Cliente.owner_id == bindparam("owner_id"),
+)
+
+
 # =========================================================
 # POST — CRIAR CLIENTE
 # =========================================================
@@ -117,10 +153,12 @@ class ClientePatch(BaseModel):
     summary="Cria um cliente para um owner vinculado",
 )
 def criar_cliente(
+    request: Request,
     payload: ClienteCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
+    current_user: CurrentUser = request.state.user
+
     now = datetime.now(br_tz)
 
     novo = Cliente(
@@ -155,7 +193,6 @@ def criar_cliente(
 
     db.add(novo)
     db.commit()
-    db.refresh(novo)
 
     return novo
 
@@ -163,18 +200,39 @@ def criar_cliente(
 # =========================================================
 # GET — LISTA TODOS OS CLIENTES DO OWNER
 # =========================================================
-@router.get("/", response_model=List[ClienteOut])
-def listar_clientes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+@router.get("/", response_model=ClientePage)
+async def listar_clientes(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="id_cliente do último item da página anterior"),
+    db: AsyncSession = Depends(get_async_db_do_owner),
 ):
-    clientes = (
-        db.query(Cliente)
-        .filter(Cliente.owner_id == current_user.owner_id)
+    current_user: CurrentUser = request.state.user
+
+    # select só das colunas do ClienteOut: devolve Rows (sem instanciar
+    # objetos ORM nem passar pelo identity map)
+    stmt = (
+        select(*CLIENTE_OUT_COLUMNS)
+        .where(Cliente.owner_id == current_user.owner_id)
         .order_by(Cliente.id_cliente.desc())
-        .all()
+        .limit(limit)
+    )
+    if cursor is not None:
+        stmt = stmt.where(Cliente.id_cliente < cursor)
+
+    clientes = (await db.execute(stmt)).all()
+    next_cursor = clientes[-1].id_cliente if len(clientes) == limit else None
+
+    # dados vindos do banco já têm os tipos do schema: model_construct
+    # pula a validação campo a campo
+    page = ClientePage.model_construct(
+        items=[ClienteOut.model_construct(**r._mapping) for r in clientes],
+        next_cursor=next_cursor,
     )
-    return clientes
+    # devolvendo Response o FastAPI não revalida contra o response_model.
+    # warnings=False: tipo_cliente vem como str (enum no schema), o JSON
+    # gerado é o mesmo
+    return Response(page.model_dump_json(warnings=False), media_type="application/json")
 
 
 # =========================================================
@@ -182,19 +240,17 @@ def listar_clientes(
 # =========================================================
 @router.patch("/{id_cliente}", response_model=ClienteOut)
 def atualizar_cliente(
+    request: Request,
     id_cliente: int,
     payload: ClientePatch,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
-    cliente = (
-        db.query(Cliente)
-        .filter(
-            Cliente.id_cliente == id_cliente,
-            Cliente.owner_id == current_user.owner_id,
-        )
-        .first()
-    )
+    current_user: CurrentUser = request.state.user
+
+    cliente = db.scalars(
+        CLIENTE_DO_OWNER_STMT,
+        {"id_cliente": id_cliente, "owner_id": current_user.owner_id},
+    ).first()
 
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente não encontrado.")
@@ -212,18 +268,16 @@ def atualizar_cliente(
 # =========================================================
 @router.delete("/{id_cliente}")
 def deletar_cliente(
+    request: Request,
     id_cliente: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
-    cliente = (
-        db.query(Cliente)
-        .filter(
-            Cliente.id_cliente == id_cliente,
-            Cliente.owner_id == current_user.owner_id,
-        )
-        .first()
-    )
+    current_user: CurrentUser = request.state.user
+
+    cliente = db.scalars(
+        CLIENTE_DO_OWNER_STMT,
+        {"id_cliente": id_cliente, "owner_id": current_user.owner_id},
+    ).first()
 
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente não encontrado.")
@@ -0,0 +1,55 @@
+# config.py
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    # JWT
+    SECRET_KEY: str
+    ACCESS_TOKEN_EXPIRE_MINUTES: int
+    REMEMBER_ME_EXPIRE_DAYS: int
+    # idade máxima da sessão desde o login (claim auth_time): o /refresh
+    # não renova além disso, é preciso logar de novo
+    MAX_SESSION_DAYS: int
+
+    # cookie do token
+    ACCESS_COOKIE_NAME: str
+    COOKIE_SECURE: bool
+    COOKIE_DOMAIN: Optional[str]  # ex.: ".seudominio.com"
+
+    # custo do bcrypt: 12 é o padrão; baixar para 10 reduz a latência do
+    # login às custas de resistência a ataques offline
+    BCRYPT_ROUNDS: int
+
+    # cache sub -> usuário autenticado; mantenha curto (<= 60s) para que
+    # desativações/trocas de tipo propaguem rápido
+    USER_CACHE_TTL_SECONDS: int
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Lê o ambiente uma vez; as chamadas seguintes devolvem o mesmo objeto."""
+    return Settings(
+        SECRET_KEY=os.getenv("SECRET_KEY", "troque-esta-chave-em-producao"),
+        ACCESS_TOKEN_EXPIRE_MINUTES=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")),
+        REMEMBER_ME_EXPIRE_DAYS=int(os.getenv("REMEMBER_ME_EXPIRE_DAYS", "30")),
+        MAX_SESSION_DAYS=int(os.getenv("MAX_SESSION_DAYS", "30")),
+        ACCESS_COOKIE_NAME=os.getenv("ACCESS_COOKIE_NAME", "access_token"),
+        COOKIE_SECURE=_env_bool("COOKIE_SECURE", "false"),
+        COOKIE_DOMAIN=os.getenv("COOKIE_DOMAIN"),
+        BCRYPT_ROUNDS=int(os.getenv("BCRYPT_ROUNDS", "12")),
+        USER_CACHE_TTL_SECONDS=int(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    )
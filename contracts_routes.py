@@ -2,19 +2,27 @@ from __future__ import annotations
 
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
-import pytz
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from db import get_db
-from auth_routes import get_current_user_v3
-from models import User, Contract  # <-- ajuste aqui para o nome real do modelo
+from auth_routes import CurrentUser, get_async_db_do_owner, get_current_user_v3
+from models import Contract  # <-- ajuste aqui para o nome real do modelo
 
-br_tz = pytz.timezone("America/Sao_Paulo")
+br_tz = ZoneInfo("America/Sao_Paulo")
 
-router = APIRouter(prefix="/v3/contracts", tags=["Contracts"])
+# autenticação no nível do router: get_current_user_v3 roda uma vez por
+# request e deixa o usuário em request.state.user
+router = APIRouter(
+    prefix="/v3/contracts",
+    tags=["Contracts"],
+    dependencies=[Depends(get_current_user_v3)],
+)
 
 
 # =========================================================
@@ -57,6 +65,27 @@ class ContractPatch(BaseModel):
     preco_avulso: Optional[float] = None
 
 
+class ContractPage(BaseModel):
+    """
+    Página da listagem (paginação por cursor/keyset).
+    Para a próxima página, envie next_cursor como ?cursor=;
+    next_cursor = None indica que não há mais itens.
+    """
+    items: List[ContractOut]
+    next_cursor: Optional[int] = None
+
+
+# colunas lidas pelas listagens: exatamente os campos do ContractOut
+CONTRACT_OUT_COLUMNS = tuple(getattr(Contract, campo) for campo in ContractOut.model_fields)
+
+# busca de um contract do owner: statement único, montado uma vez, com os
+# valores entrando como bind params (PATCH e DELETE compartilham)
+CONTRACT_DO_OWNER_STMT = select(Contract).where(
+    Contract.id_contract == bindparam("id_contract"),
+    Contract.owner_id == bindparam("owner_id"),
+)
+
+
 # =========================================================
 # POST — CRIAR CONTRACT
 # =========================================================
@@ -68,10 +97,12 @@ class ContractPatch(BaseModel):
     summary="Cria um contracts",
 )
 def criar_contract(
+    request: Request,
     payload: ContractCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
+    current_user: CurrentUser = request.state.user
+
     now = datetime.now(br_tz)
 
     novo = Contract(
@@ -89,7 +120,6 @@ def criar_contract(
 
     db.add(novo)
     db.commit()
-    db.refresh(novo)
 
     return novo
 
@@ -99,20 +129,30 @@ def criar_contract(
 # =========================================================
 @router.get(
     "/",
-    response_model=List[ContractOut],
-    summary="Lista todos os contratos do owner do usuário logado",
+    response_model=ContractPage,
+    summary="Lista os contratos do owner do usuário logado (paginado)",
 )
-def listar_contracts(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+async def listar_contracts(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="id_contract do último item da página anterior"),
+    db: AsyncSession = Depends(get_async_db_do_owner),
 ):
-    contracts = (
-        db.query(Contract)
-        .filter(Contract.owner_id == current_user.owner_id)
+    current_user: CurrentUser = request.state.user
+
+    stmt = (
+        select(*CONTRACT_OUT_COLUMNS)
+        .where(Contract.owner_id == current_user.owner_id)
         .order_by(Contract.id_contract.desc())
-        .all()
+        .limit(limit)
     )
-    return contracts
+    if cursor is not None:
+        stmt = stmt.where(Contract.id_contract < cursor)
+
+    contracts = (await db.execute(stmt)).all()
+    next_cursor = contracts[-1].id_contract if len(contracts) == limit else None
+
+    return {"items": contracts, "next_cursor": next_cursor}
 
 
 # =========================================================
@@ -124,19 +164,17 @@ def listar_contracts(
     summary="Atualiza um contrato do owner do usuário logado",
 )
 def atualizar_contract(
+    request: Request,
     id_contract: int,
     payload: ContractPatch,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
-    contract = (
-        db.query(Contract)
-        .filter(
-            Contract.id_contract == id_contract,
-            Contract.owner_id == current_user.owner_id,
-        )
-        .first()
-    )
+    current_user: CurrentUser = request.state.user
+
+    contract = db.scalars(
+        CONTRACT_DO_OWNER_STMT,
+        {"id_contract": id_contract, "owner_id": current_user.owner_id},
+    ).first()
 
     if not contract:
         raise HTTPException(status_code=404, detail="Contrato não encontrado.")
@@ -157,18 +195,16 @@ def atualizar_contract(
     summary="Deleta um contrato do owner do usuário logado",
 )
 def deletar_contract(
+    request: Request,
     id_contract: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
 ):
-    contract = (
-        db.query(Contract)
-        .filter(
-            Contract.id_contract == id_contract,
-            Contract.owner_id == current_user.owner_id,
-        )
-        .first()
-    )
+    current_user: CurrentUser = request.state.user
+
+    contract = db.scalars(
+        CONTRACT_DO_OWNER_STMT,
+        {"id_contract": id_contract, "owner_id": current_user.owner_id},
+    ).first()
 
     if not contract:
         raise HTTPException(status_code=404, detail="Contrato não encontrado.")
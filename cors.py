@@ -0,0 +1,138 @@
+# cors.py
+from __future__ import annotations
+
+from typing import Iterable
+
+# Métodos liberados no preflight. Com credenciais o navegador não aceita
+# "*" literal em Access-Control-Allow-Methods, então listamos todos.
+ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+class FastCORS:
+    """
+    CORS em ASGI puro.
+
+    Substitui o CORSMiddleware do Starlette: todos os headers fixos são
+    montados uma vez no __init__ e só anexados à resposta, sem criar
+    objetos Response/Headers por request.
+
+    - origins: lista de origens liberadas ("*" libera todas)
+    - Sempre devolve a própria origem em Access-Control-Allow-Origin,
+      porque o front usa cookie (allow-credentials) e o navegador recusa
+      "*" nesse caso.
+    """
+
+    def __init__(self, app, origins: Iterable[str], max_age: int = 600) -> None:
+        self.app = app
+
+        origins = list(origins)
+        self._allow_all = "*" in origins
+        # frozenset de bytes: o header Origin do scope já vem em bytes,
+        # então a checagem é um lookup O(1) sem decode
+        self._origins = frozenset(o.encode("latin-1") for o in origins if o != "*")
+
+        # Vary fica de fora: entra por _add_vary, junto com o Vary que a
+        # resposta da rota já tiver
+        self._simple_headers = (
+            (b"access-control-allow-credentials", b"true"),
+        )
+        # o preflight é respondido aqui mesmo: não há outro Vary para juntar
+        self._preflight_headers = (
+            (b"access-control-allow-methods", ALLOW_METHODS),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"vary", b"Origin"),
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_options = scope["method"] == "OPTIONS"
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+                # fora do OPTIONS só precisamos do Origin
+                if not is_options:
+                    break
+            elif not is_options:
+                continue
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        # request sem Origin não é CORS
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed = self._allow_all or origin in self._origins
+
+        # -------------------------
+        # PREFLIGHT
+        # -------------------------
+        if is_options and request_method is not None:
+            if not allowed:
+                await self._send_plain(send, 400, b"Disallowed CORS origin")
+                return
+
+            headers = [(b"access-control-allow-origin", origin), *self._preflight_headers]
+            if request_headers is not None:
+                headers.append((b"access-control-allow-headers", request_headers))
+
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # -------------------------
+        # REQUEST NORMAL
+        # -------------------------
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+
+        extra = ((b"access-control-allow-origin", origin), *self._simple_headers)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*self._add_vary(message.get("headers", ())), *extra]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _add_vary(headers) -> list:
+        """
+        Acrescenta Origin ao Vary da resposta: junta no header existente
+        (como o CORSMiddleware do Starlette) em vez de mandar um segundo
+        Vary; cria o header se não houver.
+        """
+        headers = list(headers)
+        for i, (name, value) in enumerate(headers):
+            if name.lower() == b"vary":
+                tokens = {t.strip().lower() for t in value.split(b",")}
+                if b"origin" not in tokens and b"*" not in tokens:
+                    headers[i] = (name, value + b", Origin")
+                return headers
+        headers.append((b"vary", b"Origin"))
+        return headers
+
+    @staticmethod
+    async def _send_plain(send, status_code: int, body: bytes) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -4,7 +4,9 @@ from __future__ import annotations
 import os
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,21 +17,92 @@ DATABASE_URL = os.getenv("TRACKING_DB_URL") or os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("Variável de ambiente TRACKING_DB_URL ou DATABASE_URL não definida.")
 
+# Pool: o padrão do SQLAlchemy (5 + 10 overflow) enfileira requests sob
+# concorrência do FastAPI. Cada worker tem DOIS pools (engine síncrono +
+# engine async), e um request async com cache miss na autenticação usa
+# uma conexão de cada. Ajuste pelo env conforme o limite do Postgres:
+#   workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW
+#              + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW) <= max_connections
+# Os padrões dividem o orçamento de 60 conexões por worker entre os dois.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos
+# espera máxima por uma conexão livre antes de erro: cobre picos curtos
+# (ex.: lote de registro de entrega) sem segurar o request indefinidamente
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos
+
+# cache de SQL compilado por engine (padrão 500). Com as variações de
+# select/insert/update das rotas + os statements internos do ORM, um
+# cache maior evita recompilar por expulsão (LRU)
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+
+# linhas por INSERT multi-VALUES (insertmanyvalues) em inserts em lote,
+# ex.: eventos da propagação entre owners. 1000 cobre a propagação de um
+# codigo_pacote num único statement
+DB_INSERTMANYVALUES_PAGE_SIZE = int(os.getenv("DB_INSERTMANYVALUES_PAGE_SIZE", "1000"))
+
+# isolamento explícito (o padrão do Postgres): cada statement vê o que já
+# foi commitado; as rotas que dependem do estado lido usam UPDATE
+# condicional / RETURNING em vez de isolamento mais forte
+DB_ISOLATION_LEVEL = "READ COMMITTED"
+
 # future=True deixa o engine compatível com a API 2.0
 engine = create_engine(
     DATABASE_URL,
+    isolation_level=DB_ISOLATION_LEVEL,
     pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    insertmanyvalues_page_size=DB_INSERTMANYVALUES_PAGE_SIZE,
     future=True,
 )
 
+# expire_on_commit=False: após o commit os objetos continuam com os valores
+# já conhecidos (PK vem do RETURNING do INSERT), sem precisar de db.refresh
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine,
     future=True,
 )
 
-Base = declarative_base()
+# Engine async para as rotas `async def` (psycopg 3 em modo async, o mesmo
+# driver do engine síncrono). Tem pool próprio, dimensionado por
+# DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW.
+# O psycopg 3 já prepara no servidor os statements repetidos na mesma
+# conexão (prepare_threshold), o equivalente ao cache do asyncpg.
+ASYNC_DATABASE_URL = make_url(DATABASE_URL)
+if ASYNC_DATABASE_URL.get_backend_name() == "postgresql":
+    ASYNC_DATABASE_URL = ASYNC_DATABASE_URL.set(drivername="postgresql+psycopg")
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    isolation_level=DB_ISOLATION_LEVEL,
+    pool_pre_ping=True,
+    pool_size=DB_ASYNC_POOL_SIZE,
+    max_overflow=DB_ASYNC_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    insertmanyvalues_page_size=DB_INSERTMANYVALUES_PAGE_SIZE,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+class Base(DeclarativeBase):
+    pass
 
 
 def get_db():
@@ -39,3 +112,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency para rotas async: Depends(get_async_db)."""
+    async with AsyncSessionLocal() as db:
+        yield db
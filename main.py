@@ -2,9 +2,9 @@
 from __future__ import annotations
 
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from db import Base, engine
+from cors import FastCORS
 
 # IMPORTS DOS ROUTERS V3 (vamos criar depois)
 # from routes_v3 import orders_router, deliveries_router, financeiro_router, owners_router
@@ -13,21 +13,19 @@ app = FastAPI(
     title="Tracking Saídas - API v3",
     version="3.0.0",
     description="API v3 baseada no novo modelo relacional (owner, cliente, orders, deliveries, financeiro, etc).",
+    # orjson serializa (inclusive datetime) em C, sem o json.dumps do stdlib
+    default_response_class=ORJSONResponse,
 )
 
 # CORS (ajuste origens conforme seu front)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # em produção, colocar só seu domínio
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+ALLOWED_ORIGINS = ["*"]  # em produção, colocar só seu domínio
+
+app.add_middleware(FastCORS, origins=ALLOWED_ORIGINS)
 
 
 # Se você **não** usa Base.metadata.create_all (porque cria tudo via migração ou pgAdmin),
-# pode comentar as 2 linhas abaixo para evitar tentar criar enum/tabelas de novo.
-Base.metadata.bind = engine
+# mantenha a linha abaixo comentada para evitar tentar criar enum/tabelas de novo.
+# (from db import Base, engine)
 # Base.metadata.create_all(engine)
 
 
@@ -43,12 +41,16 @@ from cliente_routes import router as cliente_router
 from upload_routes import router as upload_router
 from order_routes import router as order_router
 
+ROUTERS = (
+    auth_router,
+    cliente_router,
+    users_router,
+    upload_router,
+    order_router,
+)
 
-app.include_router(auth_router)
-app.include_router(cliente_router)
-app.include_router(users_router)
-app.include_router(upload_router)
-app.include_router(order_router)
+for router in ROUTERS:
+    app.include_router(router)
 
 # app.include_router(owners_router, prefix="/v3/owners", tags=["Owners v3"])
 # app.include_router(orders_router, prefix="/v3/orders", tags=["Orders v3"])
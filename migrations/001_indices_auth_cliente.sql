@@ -0,0 +1,20 @@
+-- 001_indices_auth_cliente.sql
+--
+-- Índices para os filtros quentes:
+--   - get_user_by_identifier (roda em todo request autenticado):
+--       WHERE email = :x OR username = :x
+--   - listagem de clientes do owner:
+--       WHERE owner_id = :o ORDER BY id_cliente DESC
+--
+-- CONCURRENTLY não bloqueia escrita, mas não pode rodar dentro de
+-- transação: execute cada comando separadamente (psql/pgAdmin).
+-- Se o UNIQUE falhar, existem emails/usernames duplicados a corrigir antes.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email
+    ON mt.users (email);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username
+    ON mt.users (username);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cliente_owner_id_cliente
+    ON mt.cliente (owner_id, id_cliente);
@@ -0,0 +1,15 @@
+-- 002_orders_unique_codigo.sql
+--
+-- Índice único usado pelo INSERT ... ON CONFLICT DO NOTHING na criação
+-- de orders (criar_order / criar_order_varredura_ml):
+--   (owner_id, cliente_id, codigo_pacote)
+--
+-- CONCURRENTLY não pode rodar dentro de transação: execute separadamente.
+-- Se falhar, existem orders duplicadas a corrigir antes; para listá-las:
+--   SELECT owner_id, cliente_id, codigo_pacote, count(*)
+--     FROM mt.orders
+--    GROUP BY 1, 2, 3
+--   HAVING count(*) > 1;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_orders_owner_cliente_codigo
+    ON mt.orders (owner_id, cliente_id, codigo_pacote);
@@ -0,0 +1,19 @@
+-- 003_indices_orders_codigo.sql
+--
+-- Índices para as buscas de orders por codigo_pacote:
+--   - order do owner atual (atualizar_order):
+--       WHERE owner_id = :o AND codigo_pacote = :c
+--   - propagação entre owners (status 3 -> 4, registro de entrega,
+--     regra de link_owner no criar_order):
+--       WHERE codigo_pacote = :c
+--
+-- A busca (owner_id, cliente_id, codigo_pacote) já usa o índice único
+-- ux_orders_owner_cliente_codigo (002).
+--
+-- CONCURRENTLY não pode rodar dentro de transação: execute separadamente.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_owner_codigo
+    ON mt.orders (owner_id, codigo_pacote);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_codigo
+    ON mt.orders (codigo_pacote);
@@ -0,0 +1,35 @@
+-- 004_indices_fk_filhos.sql
+--
+-- Índices nas FKs do lado "filho" das coleções (Order.events,
+-- Order.deliveries, Order.movimentos_financeiros, Delivery.proofs,
+-- Owner.movimentos_financeiros, Owner.entregador_valores,
+-- User.deliveries, User.entregador_valores).
+--
+-- O Postgres não indexa FK automaticamente: sem eles, carregar uma
+-- coleção (WHERE fk IN (...)) ou apagar o pai vira seq scan na tabela filha.
+--
+-- CONCURRENTLY não pode rodar dentro de transação: execute separadamente.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_events_order_id
+    ON mt.order_events (order_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deliveries_order_id
+    ON mt.deliveries (order_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deliveries_entregador_id
+    ON mt.deliveries (entregador_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_proofs_delivery_id
+    ON mt.proofs (delivery_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_financeiro_movimento_order_id
+    ON mt.financeiro_movimento (order_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_financeiro_movimento_owner_id
+    ON mt.financeiro_movimento (owner_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_entregador_valor_owner_id
+    ON mt.entregador_valor (owner_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_entregador_valor_entregador_id
+    ON mt.entregador_valor (entregador_id);
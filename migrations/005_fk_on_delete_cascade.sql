@@ -0,0 +1,47 @@
+-- 005_fk_on_delete_cascade.sql
+--
+-- Filhos de orders/deliveries passam a ser apagados pelo banco
+-- (ON DELETE CASCADE) em vez do cascade do ORM:
+--   order_events.order_id         -> orders
+--   deliveries.order_id           -> orders
+--   financeiro_movimento.order_id -> orders
+--   proofs.delivery_id            -> deliveries
+--
+-- Os nomes abaixo são os nomes padrão do Postgres (<tabela>_<coluna>_fkey);
+-- confira com \d mt.<tabela> se as FKs foram criadas com outro nome.
+--
+-- NOT VALID + VALIDATE: o ADD não varre a tabela segurando lock pesado;
+-- a validação roda depois sem bloquear escrita.
+
+BEGIN;
+
+ALTER TABLE mt.order_events
+    DROP CONSTRAINT IF EXISTS order_events_order_id_fkey,
+    ADD CONSTRAINT order_events_order_id_fkey
+        FOREIGN KEY (order_id) REFERENCES mt.orders (order_id)
+        ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE mt.deliveries
+    DROP CONSTRAINT IF EXISTS deliveries_order_id_fkey,
+    ADD CONSTRAINT deliveries_order_id_fkey
+        FOREIGN KEY (order_id) REFERENCES mt.orders (order_id)
+        ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE mt.financeiro_movimento
+    DROP CONSTRAINT IF EXISTS financeiro_movimento_order_id_fkey,
+    ADD CONSTRAINT financeiro_movimento_order_id_fkey
+        FOREIGN KEY (order_id) REFERENCES mt.orders (order_id)
+        ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE mt.proofs
+    DROP CONSTRAINT IF EXISTS proofs_delivery_id_fkey,
+    ADD CONSTRAINT proofs_delivery_id_fkey
+        FOREIGN KEY (delivery_id) REFERENCES mt.deliveries (delivery_id)
+        ON DELETE CASCADE NOT VALID;
+
+COMMIT;
+
+ALTER TABLE mt.order_events VALIDATE CONSTRAINT order_events_order_id_fkey;
+ALTER TABLE mt.deliveries VALIDATE CONSTRAINT deliveries_order_id_fkey;
+ALTER TABLE mt.financeiro_movimento VALIDATE CONSTRAINT financeiro_movimento_order_id_fkey;
+ALTER TABLE mt.proofs VALIDATE CONSTRAINT proofs_delivery_id_fkey;
@@ -0,0 +1,16 @@
+-- 006_indice_orders_owner_order_id.sql
+--
+-- Índice para a listagem paginada de orders (listar_orders):
+--     WHERE owner_id = :o [AND order_id < :cursor]
+--     ORDER BY order_id DESC LIMIT :n
+-- Com (owner_id, order_id) a página sai de um index scan (backward), sem
+-- varrer nem ordenar todas as orders do owner.
+--
+-- obter_order (WHERE owner_id = :o AND order_id = :id) já usa a PK.
+-- codigo_pacote e order_events.order_id já têm índice (003 e 004).
+--
+-- CONCURRENTLY não pode rodar dentro de transação: execute separadamente.
+-- Confira o plano com EXPLAIN ANALYZE depois de criar.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_owner_order_id
+    ON mt.orders (owner_id, order_id);
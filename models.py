@@ -2,22 +2,36 @@ from __future__ import annotations
 
 from datetime import datetime
 from decimal import Decimal
+from typing import List, Optional
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
-    Column,
     DateTime,
     ForeignKey,
+    Index,
     JSON,
     Numeric,
     SmallInteger,
     Text,
+    event,
+)
+from sqlalchemy.orm import (
+    Mapped,
+    ORMExecuteState,
+    Session,
+    mapped_column,
+    relationship,
+    with_loader_criteria,
 )
-from sqlalchemy.orm import relationship
 
 from db import Base
 
+# Relacionamentos são lazy="select" (carregados só se acessados). As rotas
+# devolvem schemas planos, então nada é carregado junto por padrão; quem
+# precisar de um relacionamento pede na própria query com
+# selectinload(...)/joinedload(...).
+
 # ======================
 # OWNER (EMPRESA / PRESTADOR)
 # ======================
@@ -25,50 +39,50 @@ class Owner(Base):
     __tablename__ = "owner"
     __table_args__ = {"schema": "mt"}
 
-    id_owner = Column(BigInteger, primary_key=True, autoincrement=True)
-    nome_empresa = Column(Text, nullable=False)
-    tipo_empresa = Column(Text, nullable=False)  # enum mt.owner_tipo
-    documento_empresa = Column(Text, nullable=True)
-    email_contato = Column(Text, nullable=True)
-    telefone_empresa = Column(Text, nullable=True)
-    ativo_empresa = Column(Boolean, nullable=False, default=True)
+    id_owner: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    nome_empresa: Mapped[str] = mapped_column(Text, nullable=False)
+    tipo_empresa: Mapped[str] = mapped_column(Text, nullable=False)  # enum mt.owner_tipo
+    documento_empresa: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    email_contato: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    telefone_empresa: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    ativo_empresa: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
 
-    slug = Column(Text, nullable=True)
-    custom_domain = Column(Text, nullable=True)
-    tema_json = Column(JSON, nullable=True, default=dict)
-    espelhar_status = Column(Boolean, nullable=True, default=True)
+    slug: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    custom_domain: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    tema_json: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True, default=dict)
+    espelhar_status: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True, default=True)
 
-    criado_em = Column(DateTime(timezone=True), nullable=True)
-    atualizado_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    atualizado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # relacionamentos
-    users = relationship("User", back_populates="owner", lazy="selectin")
+    users: Mapped[List[User]] = relationship("User", back_populates="owner", lazy="select")
 
-    clientes = relationship(
+    clientes: Mapped[List[Cliente]] = relationship(
         "Cliente",
         back_populates="owner",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="Cliente.owner_id",
     )
 
-    orders = relationship(
+    orders: Mapped[List[Order]] = relationship(
         "Order",
         back_populates="empresa",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="Order.owner_id",
     )
 
-    movimentos_financeiros = relationship(
+    movimentos_financeiros: Mapped[List[FinanceiroMovimento]] = relationship(
         "FinanceiroMovimento",
         back_populates="owner",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="FinanceiroMovimento.owner_id",
     )
 
-    entregador_valores = relationship(
+    entregador_valores: Mapped[List[EntregadorValor]] = relationship(
         "EntregadorValor",
         back_populates="empresa",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="EntregadorValor.owner_id",
     )
 
@@ -78,49 +92,54 @@ class Owner(Base):
 # ======================
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # get_user_by_identifier: WHERE email = :x OR username = :x
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_username", "username", unique=True),
+        {"schema": "mt"},
+    )
 
-    user_id = Column(BigInteger, primary_key=True, autoincrement=True)
-    owner_id = Column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    owner_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
 
-    nome = Column(Text, nullable=True)
-    email = Column(Text, nullable=True)
-    username = Column(Text, nullable=True)
+    nome: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    email: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    username: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    password_hash = Column(Text, nullable=False)
-    tipo = Column(Text, nullable=True)  # enum mt.user_tipo
-    ativo = Column(Boolean, nullable=True, default=True)
-    coletador = Column(Boolean, nullable=True, default=False)
+    password_hash: Mapped[str] = mapped_column(Text, nullable=False)
+    tipo: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # enum mt.user_tipo
+    ativo: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True, default=True)
+    coletador: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True, default=False)
 
-    criado_em = Column(DateTime(timezone=True), nullable=True)
-    atualizado_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    atualizado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    sobrenome = Column(Text, nullable=True)
-    documento = Column(Text, nullable=True)
-    telefone = Column(Text, nullable=True)
+    sobrenome: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    documento: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    telefone: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    endereco_rua = Column(Text, nullable=True)
-    endereco_numero = Column(Text, nullable=True)
-    endereco_complemento = Column(Text, nullable=True)
-    endereco_bairro = Column(Text, nullable=True)
-    endereco_cidade = Column(Text, nullable=True)
-    endereco_estado = Column(Text, nullable=True)
-    endereco_cep = Column(Text, nullable=True)
+    endereco_rua: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_numero: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_complemento: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_bairro: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_cidade: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_estado: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_cep: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    owner = relationship("Owner", back_populates="users", lazy="joined")
+    owner: Mapped[Owner] = relationship("Owner", back_populates="users", lazy="select")
 
     # relacionamentos com outras tabelas
-    deliveries = relationship(
+    deliveries: Mapped[List[Delivery]] = relationship(
         "Delivery",
         back_populates="entregador",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="Delivery.entregador_id",
     )
 
-    entregador_valores = relationship(
+    entregador_valores: Mapped[List[EntregadorValor]] = relationship(
         "EntregadorValor",
         back_populates="entregador",
-        lazy="selectin",
+        lazy="select",
         foreign_keys="EntregadorValor.entregador_id",
     )
 
@@ -129,48 +148,52 @@ class User(Base):
 # ======================
 class Cliente(Base):
     __tablename__ = "cliente"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # listagem: WHERE owner_id = :o ORDER BY id_cliente DESC
+        Index("ix_cliente_owner_id_cliente", "owner_id", "id_cliente"),
+        {"schema": "mt"},
+    )
 
-    id_cliente = Column(BigInteger, primary_key=True, autoincrement=True)
-    owner_id = Column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
-    link_owner_id = Column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
-
-    nome = Column(Text, nullable=False)
-    endereco_cep = Column(Text, nullable=True)  # varchar(9)
-    endereco_cidade = Column(Text, nullable=True)
-    endereco_estado = Column(Text, nullable=True)  # char(2)
-    ativo = Column(Boolean, nullable=True, default=True)
-
-    criado_em = Column(DateTime(timezone=True), nullable=True)
-
-    preco_shopee = Column(Numeric(12, 2), nullable=True, default=0)
-    preco_ml = Column(Numeric(12, 2), nullable=True, default=0)
-    preco_avulso = Column(Numeric(12, 2), nullable=True, default=0)
-    endereco_rua = Column(Text, nullable=True)
-    endereco_numero = Column(Text, nullable=True)
-    endereco_complemento = Column(Text, nullable=True)
-    endereco_bairro = Column(Text, nullable=True)
-    documento_cliente = Column(Text, nullable=True)
-    email_cliente = Column(Text, nullable=True)
-    telefone_cliente = Column(Text, nullable=True)
-    tipo_cliente = Column(Text, nullable=False)  # enum mt.tipo_cliente
+    id_cliente: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    owner_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
+    link_owner_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
+
+    nome: Mapped[str] = mapped_column(Text, nullable=False)
+    endereco_cep: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # varchar(9)
+    endereco_cidade: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_estado: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # char(2)
+    ativo: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True, default=True)
+
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    preco_shopee: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2), nullable=True, default=0)
+    preco_ml: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2), nullable=True, default=0)
+    preco_avulso: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2), nullable=True, default=0)
+    endereco_rua: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_numero: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_complemento: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    endereco_bairro: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    documento_cliente: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    email_cliente: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    telefone_cliente: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    tipo_cliente: Mapped[str] = mapped_column(Text, nullable=False)  # enum mt.tipo_cliente
 
     # deixa claro que essa relação usa a FK owner_id
-    owner = relationship(
+    owner: Mapped[Owner] = relationship(
         "Owner",
         back_populates="clientes",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[owner_id],
     )
 
     # relação opcional usando link_owner_id (sem back_populates)
-    link_owner = relationship(
+    link_owner: Mapped[Owner] = relationship(
         "Owner",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[link_owner_id],
     )
 
-    orders = relationship("Order", back_populates="cliente", lazy="selectin")
+    orders: Mapped[List[Order]] = relationship("Order", back_populates="cliente", lazy="select")
 
 
 # ======================
@@ -178,63 +201,81 @@ class Cliente(Base):
 # ======================
 class Order(Base):
     __tablename__ = "orders"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # criação de order: INSERT ... ON CONFLICT DO NOTHING
+        Index(
+            "ux_orders_owner_cliente_codigo",
+            "owner_id",
+            "cliente_id",
+            "codigo_pacote",
+            unique=True,
+        ),
+        # atualizar_order: WHERE owner_id = :o AND codigo_pacote = :c
+        Index("ix_orders_owner_codigo", "owner_id", "codigo_pacote"),
+        # propagação entre owners: WHERE codigo_pacote = :c
+        Index("ix_orders_codigo", "codigo_pacote"),
+        # listar_orders: WHERE owner_id = :o [AND order_id < :cursor]
+        # ORDER BY order_id DESC (keyset)
+        Index("ix_orders_owner_order_id", "owner_id", "order_id"),
+        {"schema": "mt"},
+    )
 
-    order_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
 
-    owner_id = Column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
-    cliente_id = Column(BigInteger, ForeignKey("mt.cliente.id_cliente"), nullable=True)
-    base_order_id = Column(BigInteger, ForeignKey("mt.orders.order_id"), nullable=True)
+    owner_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("mt.owner.id_owner"), nullable=False)
+    cliente_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("mt.cliente.id_cliente"), nullable=True)
+    base_order_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("mt.orders.order_id"), nullable=True)
 
-    codigo_pacote = Column(Text, nullable=False)
-    servico = Column(Text, nullable=False)
+    codigo_pacote: Mapped[str] = mapped_column(Text, nullable=False)
+    servico: Mapped[str] = mapped_column(Text, nullable=False)
 
-    criado_em = Column(DateTime(timezone=True), nullable=True)
-    atualizado_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    atualizado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    status = Column(SmallInteger, nullable=False, default=0)  # enum mt.pedido_status
+    status: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)  # enum mt.pedido_status
 
-    orders_rua = Column(Text, nullable=True)
-    orders_cep = Column(Text, nullable=True)
+    orders_rua: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    orders_cep: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # não há FK no schema atual
-    user_id = Column(BigInteger, nullable=True)
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
-    empresa = relationship(
+    empresa: Mapped[Owner] = relationship(
         "Owner",
         back_populates="orders",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[owner_id],
     )
 
-    cliente = relationship(
+    cliente: Mapped[Optional[Cliente]] = relationship(
         "Cliente",
         back_populates="orders",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[cliente_id],
     )
 
-    events = relationship(
+    events: Mapped[List[OrderEvent]] = relationship(
         "OrderEvent",
         back_populates="order",
-        cascade="all, delete-orphan",
-        lazy="selectin",
+        # filhos apagados pelo ON DELETE CASCADE do banco, sem carregar a coleção
+        passive_deletes=True,
+        lazy="select",
         foreign_keys="OrderEvent.order_id",
     )
 
-    deliveries = relationship(
+    deliveries: Mapped[List[Delivery]] = relationship(
         "Delivery",
         back_populates="order",
-        cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="select",
         foreign_keys="Delivery.order_id",
     )
 
-    movimentos_financeiros = relationship(
+    movimentos_financeiros: Mapped[List[FinanceiroMovimento]] = relationship(
         "FinanceiroMovimento",
         back_populates="order",
-        cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="select",
         foreign_keys="FinanceiroMovimento.order_id",
     )
 
@@ -244,18 +285,26 @@ class Order(Base):
 # ======================
 class OrderEvent(Base):
     __tablename__ = "order_events"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # FK da coleção no pai: carga do relacionamento e DELETE do pai
+        Index("ix_order_events_order_id", "order_id"),
+        {"schema": "mt"},
+    )
 
-    event_id = Column(BigInteger, primary_key=True, autoincrement=True)
-    order_id = Column(BigInteger, ForeignKey("mt.orders.order_id"), nullable=True)
+    event_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    order_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger,
+        ForeignKey("mt.orders.order_id", ondelete="CASCADE"),
+        nullable=True,
+    )
 
-    tipo = Column(SmallInteger, nullable=False)
-    actor_user_id = Column(BigInteger, nullable=True)  # sem FK no schema
-    payload = Column(JSON, nullable=True, default=dict)
-    data_hora = Column(DateTime(timezone=True), nullable=True)
-    owner_id = Column(BigInteger, nullable=True)  # sem FK no schema
+    tipo: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    actor_user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # sem FK no schema
+    payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True, default=dict)
+    data_hora: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    owner_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # sem FK no schema
 
-    order = relationship("Order", back_populates="events", lazy="joined")
+    order: Mapped[Optional[Order]] = relationship("Order", back_populates="events", lazy="select")
 
 
 # ======================
@@ -263,57 +312,62 @@ class OrderEvent(Base):
 # ======================
 class Delivery(Base):
     __tablename__ = "deliveries"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # FK da coleção no pai: carga do relacionamento e DELETE do pai
+        Index("ix_deliveries_order_id", "order_id"),
+        Index("ix_deliveries_entregador_id", "entregador_id"),
+        {"schema": "mt"},
+    )
 
-    delivery_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    delivery_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
 
-    order_id = Column(
+    order_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
-        ForeignKey("mt.orders.order_id"),
+        ForeignKey("mt.orders.order_id", ondelete="CASCADE"),
         nullable=True,
     )
-    entregador_id = Column(
+    entregador_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
         ForeignKey("mt.users.user_id"),
         nullable=True,
     )
-    cliente_id = Column(
+    cliente_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
         ForeignKey("mt.owner.id_owner"),
         nullable=True,
     )
 
-    status = Column(Text, nullable=True)
-    entregue_em = Column(DateTime(timezone=True), nullable=True)
-    motivo_ocorrencia = Column(Text, nullable=True)
-    criado_em = Column(DateTime(timezone=True), nullable=True)
+    status: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    entregue_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    motivo_ocorrencia: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    order = relationship(
+    order: Mapped[Optional[Order]] = relationship(
         "Order",
         back_populates="deliveries",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[order_id],
     )
 
-    entregador = relationship(
+    entregador: Mapped[Optional[User]] = relationship(
         "User",
         back_populates="deliveries",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[entregador_id],
     )
 
     # no Excel o nome da coluna é cliente_id, mas aponta para owner
-    prestador = relationship(
+    prestador: Mapped[Optional[Owner]] = relationship(
         "Owner",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[cliente_id],
     )
 
-    proofs = relationship(
+    proofs: Mapped[List[Proof]] = relationship(
         "Proof",
         back_populates="delivery",
-        cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="select",
         foreign_keys="Proof.delivery_id",
     )
 
@@ -323,24 +377,28 @@ class Delivery(Base):
 # ======================
 class Proof(Base):
     __tablename__ = "proofs"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # FK da coleção no pai: carga do relacionamento e DELETE do pai
+        Index("ix_proofs_delivery_id", "delivery_id"),
+        {"schema": "mt"},
+    )
 
-    id_proof = Column(BigInteger, primary_key=True, autoincrement=True)
+    id_proof: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
 
-    delivery_id = Column(
+    delivery_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
-        ForeignKey("mt.deliveries.delivery_id"),
+        ForeignKey("mt.deliveries.delivery_id", ondelete="CASCADE"),
         nullable=True,
     )
-    tipo = Column(Text, nullable=True)
-    storage_key = Column(Text, nullable=False)
+    tipo: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    storage_key: Mapped[str] = mapped_column(Text, nullable=False)
 
-    criado_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    delivery = relationship(
+    delivery: Mapped[Optional[Delivery]] = relationship(
         "Delivery",
         back_populates="proofs",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[delivery_id],
     )
 
@@ -350,42 +408,47 @@ class Proof(Base):
 # ======================
 class FinanceiroMovimento(Base):
     __tablename__ = "financeiro_movimento"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # FK da coleção no pai: carga do relacionamento e DELETE do pai
+        Index("ix_financeiro_movimento_order_id", "order_id"),
+        Index("ix_financeiro_movimento_owner_id", "owner_id"),
+        {"schema": "mt"},
+    )
 
-    id_mov = Column(BigInteger, primary_key=True, autoincrement=True)
+    id_mov: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
 
-    order_id = Column(
+    order_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
-        ForeignKey("mt.orders.order_id"),
+        ForeignKey("mt.orders.order_id", ondelete="CASCADE"),
         nullable=True,
     )
-    owner_id = Column(
+    owner_id: Mapped[Optional[int]] = mapped_column(
         BigInteger,
         ForeignKey("mt.owner.id_owner"),
         nullable=True,
     )
 
-    destino_tipo = Column(Text, nullable=True)
-    destino_id = Column(BigInteger, nullable=True)
+    destino_tipo: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    destino_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
 
-    tipo = Column(Text, nullable=True)
-    servico = Column(Text, nullable=True)
+    tipo: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    servico: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    valor = Column(Numeric(12, 2), nullable=True)
-    status = Column(Text, nullable=True, default="pendente")
+    valor: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2), nullable=True)
+    status: Mapped[Optional[str]] = mapped_column(Text, nullable=True, default="pendente")
 
-    criado_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    order = relationship(
+    order: Mapped[Optional[Order]] = relationship(
         "Order",
         back_populates="movimentos_financeiros",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[order_id],
     )
-    owner = relationship(
+    owner: Mapped[Optional[Owner]] = relationship(
         "Owner",
         back_populates="movimentos_financeiros",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[owner_id],
     )
 
@@ -395,36 +458,73 @@ class FinanceiroMovimento(Base):
 # ======================
 class EntregadorValor(Base):
     __tablename__ = "entregador_valor"
-    __table_args__ = {"schema": "mt"}
+    __table_args__ = (
+        # FK da coleção no pai: carga do relacionamento e DELETE do pai
+        Index("ix_entregador_valor_owner_id", "owner_id"),
+        Index("ix_entregador_valor_entregador_id", "entregador_id"),
+        {"schema": "mt"},
+    )
 
-    valor_entregado_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    valor_entregado_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
 
-    owner_id = Column(
+    owner_id: Mapped[int] = mapped_column(
         BigInteger,
         ForeignKey("mt.owner.id_owner"),
         nullable=False,
     )
-    entregador_id = Column(
+    entregador_id: Mapped[int] = mapped_column(
         BigInteger,
         ForeignKey("mt.users.user_id"),
         nullable=False,
     )
 
-    servico = Column(Text, nullable=False)
-    valor = Column(Numeric(12, 2), nullable=False)
+    servico: Mapped[str] = mapped_column(Text, nullable=False)
+    valor: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
 
-    ativo = Column(Boolean, nullable=True, default=True)
-    criado_em = Column(DateTime(timezone=True), nullable=True)
+    ativo: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True, default=True)
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    empresa = relationship(
+    empresa: Mapped[Owner] = relationship(
         "Owner",
         back_populates="entregador_valores",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[owner_id],
     )
-    entregador = relationship(
+    entregador: Mapped[User] = relationship(
         "User",
         back_populates="entregador_valores",
-        lazy="joined",
+        lazy="select",
         foreign_keys=[entregador_id],
     )
+
+
+# ======================
+# ESCOPO POR OWNER NOS RELACIONAMENTOS
+# ======================
+@event.listens_for(Session, "do_orm_execute")
+def filtrar_relacionamentos_por_owner(execute_state: ORMExecuteState) -> None:
+    """
+    Com session.info["owner_id"] definido, toda carga de relacionamento que traga Order / Cliente / OrderEvent
+    recebe WHERE owner_id = :owner_id. Ex.: cliente.orders ou order.events
+    nunca trazem linhas de outro owner.
+
+    Quem define o owner_id: get_current_user_v3 na Session síncrona de
+    get_db e get_async_db_do_owner na AsyncSession das rotas async (o
+    evento da Session também roda para a sync_session da AsyncSession).
+    Sessões abertas sem usuário (get_async_db puro, AsyncSessionLocal em
+    background) não têm escopo.
+
+    Só vale para cargas de relacionamento: as consultas de topo continuam
+    com o filtro explícito (a propagação entre owners pelo mesmo
+    codigo_pacote depende disso).
+    """
+    owner_id = execute_state.session.info.get("owner_id")
+    if owner_id is None or not execute_state.is_relationship_load:
+        return
+
+    # lambdas: o owner_id vira bind param e o SQL compilado fica no cache
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(Order, lambda cls: cls.owner_id == owner_id, include_aliases=True),
+        with_loader_criteria(Cliente, lambda cls: cls.owner_id == owner_id, include_aliases=True),
+        with_loader_criteria(OrderEvent, lambda cls: cls.owner_id == owner_id, include_aliases=True),
+    )
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
-from typing import Optional, List
+from dataclasses import dataclass
+from typing import Annotated, Optional, List
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
-import pytz
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import Row, and_, case, func, insert, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, raiseload
 
 from db import get_db
-from auth_routes import get_current_user_v3
+from auth_routes import CurrentUser, get_async_db_do_owner, get_current_user_v3, require_entregador
 from models import Owner, User, Order, OrderEvent, Cliente
 
-br_tz = pytz.timezone("America/Sao_Paulo")
+br_tz = ZoneInfo("America/Sao_Paulo")
 
 router = APIRouter(prefix="/v3/orders", tags=["Orders"])
 
@@ -62,13 +67,420 @@ class RegistroEntregaPayload(BaseModel):
     codigo_pacote: str = Field(min_length=1)
 
 
+class BatchRegistroEntregaPayload(BaseModel):
+    """Vários códigos numa só chamada (ex.: entregas registradas em sequência)."""
+    codigos: List[Annotated[str, Field(min_length=1)]] = Field(min_length=1, max_length=200)
+
+    @field_validator("codigos")
+    @classmethod
+    def sem_repetidos(cls, codigos: List[str]) -> List[str]:
+        # mantém a ordem de envio (é a ordem da resposta)
+        return list(dict.fromkeys(codigos))
+
+
+class OrderEventOut(BaseModel):
+    event_id: int
+    tipo: int
+    actor_user_id: Optional[int] = None
+    data_hora: Optional[datetime] = None
+
+
+class OrderComEventosOut(OrderOut):
+    """OrderOut + histórico de eventos (mais antigo primeiro)."""
+    events: List[OrderEventOut]
+
+
+class OrderPage(BaseModel):
+    """
+    Página da listagem (paginação por cursor/keyset).
+    Para a próxima página, envie next_cursor como ?cursor=;
+    next_cursor = None indica que não há mais itens.
+    """
+    items: List[OrderOut]
+    next_cursor: Optional[int] = None
+
+
+# colunas lidas pelas listagens: exatamente os campos do OrderOut
+ORDER_OUT_FIELDS = tuple(OrderOut.model_fields)
+ORDER_OUT_COLUMNS = tuple(getattr(Order, campo) for campo in ORDER_OUT_FIELDS)
+
+# select(Order) que só vira OrderOut: carrega só essas colunas;
+# raiseload=True faz um acesso a outra coluna falhar em vez de virar SELECT,
+# e raiseload("*") faz o mesmo com os relacionamentos (o OrderOut não usa
+# nenhum: um acesso seria N+1 escondido). Use com .options(*ORDER_OUT_LOAD).
+ORDER_OUT_LOAD = (
+    load_only(*ORDER_OUT_COLUMNS, raiseload=True),
+    raiseload("*"),
+)
+
+
+def order_out_dict(order: Order | Row) -> dict:
+    """
+    Campos do OrderOut lidos da order em memória (objeto Order ou Row com
+    as colunas de ORDER_OUT_COLUMNS). Os valores já vêm do banco com os
+    tipos do schema: o dict vai direto para o orjson, como na listagem.
+    """
+    return {campo: getattr(order, campo) for campo in ORDER_OUT_FIELDS}
+
+
+def order_json_response(order: Order | Row, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    OrderOut já serializado (orjson), sem instanciar o modelo Pydantic nem
+    passar pelo from_attributes + revalidação do response_model.
+    Como é um Response, o status_code do decorator não vale: passe aqui.
+    """
+    return ORJSONResponse(order_out_dict(order), status_code=status_code)
+
+
+ORDER_DUPLICADA_DETAIL = "Já existe um order com este cliente_id + codigo_pacote."
+ORDER_STATUS_ALTERADO_DETAIL = "O status da order foi alterado por outra requisição. Tente novamente."
+
+
+# =========================================================
+# INSERT DE ORDER SEM DUPLICIDADE
+# =========================================================
+def inserir_order(db: Session, **valores) -> Order:
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING sobre o índice único
+    (owner_id, cliente_id, codigo_pacote).
+
+    Checagem de duplicidade e insert num único round-trip, sem a corrida
+    entre um SELECT prévio e o INSERT. Sem linha de volta = já existia.
+    """
+    stmt = (
+        pg_insert(Order)
+        .values(**valores)
+        .on_conflict_do_nothing(index_elements=["owner_id", "cliente_id", "codigo_pacote"])
+        .returning(Order)
+    )
+    order = db.scalars(stmt).one_or_none()
+    if order is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ORDER_DUPLICADA_DETAIL,
+        )
+    return order
+
+
+# =========================================================
+# EVENTOS DE ORDER
+# =========================================================
+def evento_order(
+    order_id: int,
+    tipo: int,
+    actor_user_id: Optional[int],
+    data_hora: datetime,
+    owner_id: int,
+) -> dict:
+    """Linha de mt.order_events (sem payload) para inserir_eventos."""
+    return {
+        "order_id": order_id,
+        "tipo": tipo,
+        "actor_user_id": actor_user_id,
+        "payload": None,
+        "data_hora": data_hora,
+        "owner_id": owner_id,
+    }
+
+
+def inserir_eventos(db: Session, eventos: List[dict]) -> None:
+    """
+    INSERT dos eventos em lote (Core, sem objetos OrderEvent no unit of
+    work). Várias linhas viram um INSERT multi-VALUES (insertmanyvalues).
+    """
+    if eventos:
+        db.execute(insert(OrderEvent), eventos)
+
+
+# a partir daqui o COPY compensa o custo fixo em relação ao INSERT em lote
+EVENTOS_COPY_MIN = 500
+
+EVENTOS_COLUNAS = ("order_id", "tipo", "actor_user_id", "payload", "data_hora", "owner_id")
+EVENTOS_COPY_SQL = (
+    f"COPY {OrderEvent.__table__.fullname} ({', '.join(EVENTOS_COLUNAS)}) FROM STDIN"
+)
+
+
+async def copiar_eventos(db: AsyncSession, eventos: List[dict]) -> None:
+    """
+    COPY ... FROM STDIN dos eventos (dicts de evento_order) pela conexão
+    psycopg da própria AsyncSession: entra na mesma transação e vale o
+    commit da sessão. Para lotes grandes é mais rápido que o INSERT
+    multi-VALUES.
+    """
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    async with raw.driver_connection.cursor() as cur:
+        async with cur.copy(EVENTOS_COPY_SQL) as copy:
+            for e in eventos:
+                await copy.write_row(tuple(e[c] for c in EVENTOS_COLUNAS))
+
+
+async def gravar_eventos(db: AsyncSession, eventos: List[dict]) -> None:
+    """
+    INSERT em lote dos eventos na transação corrente da AsyncSession (COPY
+    acima de EVENTOS_COPY_MIN linhas). Chamado junto com o UPDATE de status:
+    os dois commitam (ou não) juntos, nenhum evento de auditoria se perde.
+    """
+    if not eventos:
+        return
+    if len(eventos) > EVENTOS_COPY_MIN:
+        await copiar_eventos(db, eventos)
+    else:
+        await db.execute(insert(OrderEvent), eventos)
+
+
+# =========================================================
+# UPDATE CONDICIONAL DE STATUS
+# =========================================================
+def atualizar_status_order(
+    db: Session,
+    order: Order,
+    status_esperado: int,
+    **valores,
+) -> Order:
+    """
+    UPDATE ... WHERE order_id = :id AND status = :status_esperado RETURNING.
+
+    A checagem do status vai no próprio UPDATE: se outra requisição mudou
+    o status depois do SELECT, nenhuma linha volta e respondemos 409 (em
+    vez de duas transições concorrentes passarem). O RETURNING repopula
+    `order` na Session, sem SELECT extra.
+
+    O índice único (owner_id, cliente_id, codigo_pacote) vale também para o
+    UPDATE: trocar o cliente_id para um que o owner já tem com o mesmo
+    código vira o mesmo 400 de inserir_order.
+    """
+    try:
+        atualizada = db.scalars(
+            update(Order)
+            .where(Order.order_id == order.order_id)
+            .where(Order.status == status_esperado)
+            .values(**valores)
+            .returning(Order),
+            execution_options={"populate_existing": True, "synchronize_session": False},
+        ).one_or_none()
+    except IntegrityError as e:
+        db.rollback()
+        constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+        if constraint != "ux_orders_owner_cliente_codigo":
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ORDER_DUPLICADA_DETAIL,
+        )
+
+    if atualizada is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ORDER_STATUS_ALTERADO_DETAIL,
+        )
+    return atualizada
+
+
+# =========================================================
+# TRANSIÇÕES DO PATCH /update-order
+# =========================================================
+@dataclass(frozen=True)
+class PatchOrder:
+    """Dados comuns às transições do PATCH /update-order."""
+    db: Session
+    payload: OrderUpdate
+    linha: Row  # order principal + alvos de validação (cliente / entregador)
+    current_user: CurrentUser
+    agora: datetime
+
+    @property
+    def order(self) -> Order:
+        return self.linha.Order
+
+    @property
+    def owner_id(self) -> int:
+        return self.current_user.owner_id
+
+    @property
+    def extras(self) -> dict:
+        # servico (se vier) entra no mesmo UPDATE do status
+        if self.payload.servico is None:
+            return {}
+        return {"servico": self.payload.servico}
+
+
+def validar_cliente_sub_base(p: PatchOrder) -> None:
+    if p.linha.cliente_encontrado is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cliente não encontrado para este owner.",
+        )
+
+    if (p.linha.cliente_tipo or "").upper() != "SUB_BASE":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cliente informado não é do tipo SUB_BASE.",
+        )
+
+
+def validar_entregador(p: PatchOrder) -> None:
+    # entregador do mesmo owner (já veio no SELECT da order)
+    if p.linha.user_encontrado is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário (user_id) não encontrado para este owner.",
+        )
+
+    if (p.linha.user_tipo or "").upper() != "ENTREGADOR":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Usuário informado não é do tipo ENTREGADOR.",
+        )
+
+
+def transicionar(p: PatchOrder, **valores) -> Order:
+    """Transição da order principal: UPDATE condicional + evento do novo status."""
+    order = p.order
+    atualizar_status_order(
+        p.db,
+        order,
+        status_esperado=order.status,
+        atualizado_em=p.agora,
+        **p.extras,
+        **valores,
+    )
+
+    inserir_eventos(p.db, [
+        evento_order(
+            order_id=order.order_id,
+            tipo=order.status,
+            actor_user_id=p.current_user.user_id,
+            data_hora=p.agora,
+            owner_id=p.owner_id,
+        ),
+    ])
+    return order
+
+
+def transicao_recebida(p: PatchOrder) -> Order:
+    # status 0 -> 1
+    return transicionar(p, status=1, user_id=p.current_user.user_id)
+
+
+def transicao_prestador(p: PatchOrder) -> Order:
+    # status 1 + cliente_id (SUB_BASE) -> 2
+    validar_cliente_sub_base(p)
+    return transicionar(
+        p,
+        cliente_id=p.payload.cliente_id,
+        status=2,
+        user_id=p.current_user.user_id,
+    )
+
+
+def transicao_entregador(p: PatchOrder) -> Order:
+    # status 1 + user_id (ENTREGADOR) -> 4
+    validar_entregador(p)
+    return transicionar(p, user_id=p.payload.user_id, status=4)
+
+
+def transicao_entregador_todas(p: PatchOrder) -> Order:
+    """
+    status 3 + user_id (ENTREGADOR) -> 4 em TODAS as orders com esse
+    codigo_pacote (inclusive outras owners), com um evento para cada uma.
+    """
+    validar_entregador(p)
+
+    order = p.order
+
+    # apenas na order do owner atual gravamos o entregador (e o servico)
+    eh_principal = Order.order_id == order.order_id
+    valores = {
+        "status": 4,
+        "atualizado_em": p.agora,
+        "user_id": case((Order.owner_id == p.owner_id, p.payload.user_id), else_=Order.user_id),
+    }
+    if p.payload.servico is not None:
+        valores["servico"] = case((eh_principal, p.payload.servico), else_=Order.servico)
+
+    # Um único UPDATE em TODAS as orders com o mesmo codigo_pacote
+    # (todas as owners). A principal só entra se ainda estiver em 3.
+    atualizadas = p.db.scalars(
+        update(Order)
+        .where(Order.codigo_pacote == p.payload.codigo_pacote)
+        .where(or_(~eh_principal, Order.status == 3))
+        .values(**valores)
+        .returning(Order),
+        execution_options={"populate_existing": True, "synchronize_session": False},
+    ).all()
+
+    if not any(o.order_id == order.order_id for o in atualizadas):
+        # outra requisição mudou o status da principal entre o SELECT e o UPDATE
+        p.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ORDER_STATUS_ALTERADO_DETAIL,
+        )
+
+    # eventos de todas as orders atualizadas num INSERT só
+    inserir_eventos(p.db, [
+        evento_order(
+            order_id=o.order_id,
+            tipo=4,
+            actor_user_id=p.current_user.user_id,
+            data_hora=p.agora,
+            owner_id=o.owner_id,
+        )
+        for o in atualizadas
+    ])
+    return order
+
+
+def exigir_cliente_ou_user(p: PatchOrder) -> Order:
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Para status 1, envie cliente_id OU user_id (mas não ambos).",
+    )
+
+
+def exigir_entregador(p: PatchOrder) -> Order:
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Para status 3, é obrigatório informar user_id (entregador).",
+    )
+
+
+_AMBOS = (False, True)
+
+# (status atual, veio cliente_id?, veio user_id?) -> transição
+TRANSICOES_PATCH = {
+    # status 0: cliente_id / user_id são ignorados
+    **{(0, c, u): transicao_recebida for c in _AMBOS for u in _AMBOS},
+    # status 1: cliente_id OU user_id
+    (1, True, False): transicao_prestador,
+    (1, False, True): transicao_entregador,
+    (1, False, False): exigir_cliente_ou_user,
+    (1, True, True): exigir_cliente_ou_user,
+    # status 3: user_id obrigatório, cliente_id ignorado
+    **{(3, c, True): transicao_entregador_todas for c in _AMBOS},
+    **{(3, c, False): exigir_entregador for c in _AMBOS},
+}
+
+
 # =========================================================
 # FUNÇÃO GENÉRICA DE TRANSIÇÃO DE STATUS (AUXILIAR, OPCIONAL)
 # =========================================================
+# fluxos por slug do owner: status atual -> próximo status
+FLUXOS_STATUS = {
+    "1": {0: 1, 1: 2, 2: 3, 3: 4, 4: 5},
+    "2": {0: 1, 2: 5},
+    "3": {1: 1, 4: 5},
+    "4": {4: 5},
+}
+
+
 def aplicar_transicao_status(
     order: Order,
     owner: Owner,
-    current_user: User,
+    current_user: CurrentUser,
     db: Session,
 ) -> Order:
     """
@@ -78,22 +490,10 @@ def aplicar_transicao_status(
     baseada em status 0, 1 e 3.
     """
 
-    fluxo_1 = {0: 1, 1: 2, 2: 3, 3: 4, 4: 5}
-    fluxo_2 = {0: 1, 2: 5}
-    fluxo_3 = {1: 1, 4: 5}
-    fluxo_4 = {4: 5}
-
     slug = (owner.slug or "1").strip()
 
-    if slug == "1":
-        mapa = fluxo_1
-    elif slug == "2":
-        mapa = fluxo_2
-    elif slug == "3":
-        mapa = fluxo_3
-    elif slug == "4":
-        mapa = fluxo_4
-    else:
+    mapa = FLUXOS_STATUS.get(slug)
+    if mapa is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Fluxo de status não configurado para o slug='{slug}'.",
@@ -140,31 +540,21 @@ def aplicar_transicao_status(
 def criar_order_varredura_ml(
     payload: OrderCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
     """
     POST antigo, mantido para a varredura ML.
     - Evita duplicidade de (owner_id, cliente_id, codigo_pacote)
     - Cria order com status = 0
+    - Order e primeiro evento na mesma transação (um único commit)
     """
     owner_id = current_user.owner_id
 
-    existing = db.execute(
-        select(Order)
-        .where(Order.owner_id == owner_id)
-        .where(Order.cliente_id == payload.cliente_id)
-        .where(Order.codigo_pacote == payload.codigo_pacote)
-    ).scalar_one_or_none()
-
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Já existe um order com este cliente_id + codigo_pacote.",
-        )
-
     agora = datetime.now(br_tz)
 
-    novo_order = Order(
+    # duplicidade (owner + cliente + codigo_pacote) resolvida no próprio INSERT
+    novo_order = inserir_order(
+        db,
         owner_id=owner_id,
         cliente_id=payload.cliente_id,
         codigo_pacote=payload.codigo_pacote,
@@ -177,23 +567,18 @@ def criar_order_varredura_ml(
         user_id=None,
     )
 
-    db.add(novo_order)
-    db.commit()
-    db.refresh(novo_order)
-
-    primeiro_evento = OrderEvent(
-        order_id=novo_order.order_id,
-        tipo=novo_order.status,  # 0
-        actor_user_id=None,
-        payload=None,
-        data_hora=agora,
-        owner_id=owner_id,
-    )
-
-    db.add(primeiro_evento)
+    inserir_eventos(db, [
+        evento_order(
+            order_id=novo_order.order_id,
+            tipo=novo_order.status,  # 0
+            actor_user_id=None,
+            data_hora=agora,
+            owner_id=owner_id,
+        ),
+    ])
     db.commit()
 
-    return novo_order
+    return order_json_response(novo_order, status.HTTP_201_CREATED)
 
 # =========================================================
 # NOVO POST - CRIAR ORDER (APENAS PARA SUB_BASE, STATUS 3)
@@ -207,7 +592,7 @@ def criar_order_varredura_ml(
 def criar_order(
     payload: OrderCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
     owner_id = current_user.owner_id
 
@@ -227,18 +612,7 @@ def criar_order(
     link_owner_id = cliente.link_owner_id  # pode ser None
 
     # 1) REGRA ANTIGA — impedir duplicidade (owner + cliente + codigo_pacote)
-    existing = db.execute(
-        select(Order)
-        .where(Order.owner_id == owner_id)
-        .where(Order.cliente_id == payload.cliente_id)
-        .where(Order.codigo_pacote == payload.codigo_pacote)
-    ).scalar_one_or_none()
-
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Já existe um order com este cliente_id + codigo_pacote.",
-        )
+    #    garantida pelo ON CONFLICT do INSERT no passo 3
 
     # 2) NOVA REGRA — validar relação link_owner_id x orders existentes
     base_order_id: Optional[int] = None
@@ -247,10 +621,31 @@ def criar_order(
     if link_owner_id is not None:
         # todas as orders que já usam esse código, em qualquer owner
         orders_mesmo_codigo = db.execute(
-            select(Order).where(Order.codigo_pacote == payload.codigo_pacote)
+            select(Order)
+            .options(
+                load_only(
+                    Order.order_id,
+                    Order.owner_id,
+                    Order.cliente_id,
+                    Order.criado_em,
+                    raiseload=True,
+                )
+            )
+            .where(Order.codigo_pacote == payload.codigo_pacote)
         ).scalars().all()
 
         if orders_mesmo_codigo:
+            # duplicidade já visível aqui: responde como antes, antes das
+            # regras de rede abaixo
+            if any(
+                o.owner_id == owner_id and o.cliente_id == payload.cliente_id
+                for o in orders_mesmo_codigo
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=ORDER_DUPLICADA_DETAIL,
+                )
+
             # verifica se existe algum owner diferente do link_owner_id
             owners_diferentes = {
                 o.owner_id for o in orders_mesmo_codigo
@@ -277,7 +672,8 @@ def criar_order(
     agora = datetime.now(br_tz)
 
     # 3) CRIAR ORDER — SEMPRE com user_id = current_user.user_id
-    novo_order = Order(
+    novo_order = inserir_order(
+        db,
         owner_id=owner_id,
         cliente_id=payload.cliente_id,
         codigo_pacote=payload.codigo_pacote,
@@ -291,24 +687,19 @@ def criar_order(
         base_order_id=base_order_id,   # <<--- NOVO: ordem da BASE, se existir
     )
 
-    db.add(novo_order)
-    db.commit()
-    db.refresh(novo_order)
-
-    # 4) CRIAR PRIMEIRO EVENTO (status 3)
-    primeiro_evento = OrderEvent(
-        order_id=novo_order.order_id,
-        tipo=3,
-        actor_user_id=current_user.user_id,
-        payload=None,
-        data_hora=agora,
-        owner_id=owner_id,
-    )
-
-    db.add(primeiro_evento)
+    # 4) CRIAR PRIMEIRO EVENTO (status 3) — mesma transação, commit único
+    inserir_eventos(db, [
+        evento_order(
+            order_id=novo_order.order_id,
+            tipo=3,
+            actor_user_id=current_user.user_id,
+            data_hora=agora,
+            owner_id=owner_id,
+        ),
+    ])
     db.commit()
 
-    return novo_order
+    return order_json_response(novo_order, status.HTTP_201_CREATED)
 
 
 # =========================================================
@@ -323,320 +714,334 @@ def criar_order(
 def atualizar_order(
     payload: OrderUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
+    """
+    Transições suportadas (ver TRANSICOES_PATCH):
+    - status 0 -> 1
+    - status 1 + cliente_id PRESTADOR (SUB_BASE) -> 2
+    - status 1 + user_id ENTREGADOR -> 4
+    - status 3 + user_id ENTREGADOR -> 4 em todas as orders do codigo_pacote
+    """
     owner_id = current_user.owner_id
 
-    # Buscar a order principal (do owner atual) pelo codigo_pacote
-    order = db.execute(
-        select(Order)
+    # Buscar a order principal (do owner atual) pelo codigo_pacote, já com
+    # o cliente (cliente_id) e o entregador (user_id) do payload para as
+    # validações: um SELECT só. Os LEFT JOINs só acham linha se o id veio
+    # no payload e pertence ao owner atual.
+    linha = db.execute(
+        select(
+            Order,
+            Cliente.id_cliente.label("cliente_encontrado"),
+            Cliente.tipo_cliente.label("cliente_tipo"),
+            User.user_id.label("user_encontrado"),
+            User.tipo.label("user_tipo"),
+        )
+        .select_from(Order)
+        .options(*ORDER_OUT_LOAD)
+        .outerjoin(
+            Cliente,
+            and_(Cliente.id_cliente == payload.cliente_id, Cliente.owner_id == owner_id),
+        )
+        .outerjoin(
+            User,
+            and_(User.user_id == payload.user_id, User.owner_id == owner_id),
+        )
         .where(Order.owner_id == owner_id)
         .where(Order.codigo_pacote == payload.codigo_pacote)
-    ).scalar_one_or_none()
+    ).one_or_none()
 
-    if not order:
+    if not linha:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Encomenda não foi encontrada para este owner + codigo_pacote.",
         )
 
-    agora = datetime.now(br_tz)
-
-    # Atualizar servico se vier
-    if payload.servico is not None:
-        order.servico = payload.servico
-
-    # -------------------------
-    # CASO 1: status atual = 0 -> vira 1
-    # -------------------------
-    if order.status == 0:
-        order.status = 1
-        order.atualizado_em = agora
-        order.user_id = current_user.user_id
-
-        novo_evento = OrderEvent(
-            order_id=order.order_id,
-            tipo=order.status,  # 1
-            actor_user_id=current_user.user_id,
-            payload=None,
-            data_hora=agora,
-            owner_id=owner_id,
+    status_atual = linha.Order.status
+    transicao = TRANSICOES_PATCH.get(
+        (status_atual, payload.cliente_id is not None, payload.user_id is not None)
+    )
+    if transicao is None:
+        # OUTROS STATUS NÃO SUPORTADOS
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Status atual {status_atual} não permite este PATCH.",
         )
 
-        db.add(novo_evento)
-        db.commit()
-        db.refresh(order)
-        return order
-
-    # -------------------------
-    # CASO 2: status atual = 1
-    # - cliente_id PRESTADOR -> status 2
-    # - user_id ENTREGADOR   -> status 4
-    # -------------------------
-    if order.status == 1:
-        # 2A) cliente_id preenchido e user_id em branco
-        if payload.cliente_id is not None and payload.user_id is None:
-            cliente = db.execute(
-                select(Cliente)
-                .where(Cliente.id_cliente == payload.cliente_id)
-                .where(Cliente.owner_id == owner_id)
-            ).scalar_one_or_none()
-
-            if not cliente:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Cliente não encontrado para este owner.",
-                )
-
-            if (cliente.tipo_cliente or "").upper() != "SUB_BASE":
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Cliente informado não é do tipo SUB_BASE.",
-                )
-
-            order.cliente_id = payload.cliente_id
-            order.status = 2
-            order.atualizado_em = agora
-            order.user_id = current_user.user_id
-
-            novo_evento = OrderEvent(
-                order_id=order.order_id,
-                tipo=order.status,  # 2
-                actor_user_id=current_user.user_id,
-                payload=None,
-                data_hora=agora,
-                owner_id=owner_id,
-            )
+    order = transicao(
+        PatchOrder(
+            db=db,
+            payload=payload,
+            linha=linha,
+            current_user=current_user,
+            agora=datetime.now(br_tz),
+        )
+    )
 
-            db.add(novo_evento)
-            db.commit()
-            db.refresh(order)
-            return order
+    db.commit()
+    return order_json_response(order)
 
-        # 2B) cliente_id em branco e user_id preenchido
-        if payload.cliente_id is None and payload.user_id is not None:
-            user_entregador = db.execute(
-                select(User)
-                .where(User.user_id == payload.user_id)
-                .where(User.owner_id == owner_id)
-            ).scalar_one_or_none()
 
-            if not user_entregador:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Usuário (user_id) não encontrado para este owner.",
-                )
+# =========================================================
+# PATCH - REGISTRO DE ENTREGA (2 ➜ 5 OU 4 ➜ 5)
+# =========================================================
+ENTREGA_STATUS_INVALIDO_DETAIL = "Entrega só pode ser registrada se alguma linha estiver em status 2 ou 4."
 
-            if (user_entregador.tipo or "").upper() != "ENTREGADOR":
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Usuário informado não é do tipo ENTREGADOR.",
-                )
 
-            order.user_id = payload.user_id
-            order.status = 4
-            order.atualizado_em = agora
-
-            novo_evento = OrderEvent(
-                order_id=order.order_id,
-                tipo=order.status,  # 4
-                actor_user_id=current_user.user_id,
-                payload=None,
-                data_hora=agora,
-                owner_id=owner_id,
-            )
+async def marcar_entregues(
+    db: AsyncSession,
+    order_ids: List[int],
+    user_id: int,
+    agora: datetime,
+) -> List[Row]:
+    """
+    UPDATE das orders para status 5 com user_id = entregador, num único
+    statement. O RETURNING já traz as colunas do OrderOut (e o owner_id dos
+    eventos), sem SELECT depois do UPDATE.
+    """
+    return (await db.execute(
+        update(Order)
+        .where(Order.order_id.in_(order_ids))
+        .values(status=5, atualizado_em=agora, user_id=user_id)
+        .returning(Order.owner_id, *ORDER_OUT_COLUMNS),
+        execution_options={"synchronize_session": False},
+    )).all()
+
+
+def eventos_entrega(atualizadas: List[Row], user_id: int, agora: datetime) -> List[dict]:
+    """Um evento tipo 5 por order marcada como entregue."""
+    return [
+        evento_order(o.order_id, 5, user_id, agora, o.owner_id)
+        for o in atualizadas
+    ]
 
-            db.add(novo_evento)
-            db.commit()
-            db.refresh(order)
-            return order
+@router.patch(
+    "/registro-entrega",
+    response_model=OrderOut,
+    status_code=status.HTTP_200_OK,
+    summary="Registra a entrega (status 5) e propaga para todos os owners do mesmo código",
+)
+async def registro_entrega(
+    payload: RegistroEntregaPayload,
+    # antes do db: sem ENTREGADOR, o 403 sai sem abrir a AsyncSession
+    current_user: CurrentUser = Depends(require_entregador),
+    db: AsyncSession = Depends(get_async_db_do_owner),
+):
+    owner_id = current_user.owner_id
+    agora = datetime.now(br_tz)
 
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Para status 1, envie cliente_id OU user_id (mas não ambos).",
+    # SELECT + UPDATE numa única transação: o begin() commita ao sair do
+    # bloco e faz rollback se uma das checagens levantar HTTPException
+    async with db.begin():
+        # Buscar todas as orders do código: só as colunas usadas nas checagens
+        # e nos eventos, sem hidratar objetos Order. A propagação vale para
+        # todos os owners do código, mas só se o owner do entregador também
+        # tiver a order: o EXISTS (índice owner_id + codigo_pacote) faz essa
+        # checagem no próprio SELECT.
+        order_do_owner = (
+            select(Order.order_id)
+            .where(Order.owner_id == owner_id)
+            .where(Order.codigo_pacote == payload.codigo_pacote)
+            .exists()
         )
+        orders_mesmo_codigo = (await db.execute(
+            select(Order.order_id, Order.owner_id, Order.status)
+            .where(Order.codigo_pacote == payload.codigo_pacote)
+            .where(order_do_owner)
+        )).all()
 
-    # -------------------------
-    # CASO 3: status atual = 3
-    # - user_id OBRIGATÓRIO
-    # - user_id deve ser ENTREGADOR do mesmo owner
-    # - atualizar TODAS as orders com esse codigo_pacote para 4
-    #   (inclusive outras owners) e criar eventos para cada uma
-    # -------------------------
-    if order.status == 3:
-        if payload.user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Para status 3, é obrigatório informar user_id (entregador).",
-            )
-
-        # valida entregador do mesmo owner
-        user_entregador = db.execute(
-            select(User)
-            .where(User.user_id == payload.user_id)
-            .where(User.owner_id == owner_id)
-        ).scalar_one_or_none()
-
-        if not user_entregador:
+        if not orders_mesmo_codigo:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuário (user_id) não encontrado para este owner.",
+                detail="Nenhuma order encontrada com esse codigo_pacote."
             )
 
-        if (user_entregador.tipo or "").upper() != "ENTREGADOR":
+        # Verifica se existe pelo menos uma em status 2 OU 4
+        if not any(o.status in (2, 4) for o in orders_mesmo_codigo):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Usuário informado não é do tipo ENTREGADOR.",
+                detail=ENTREGA_STATUS_INVALIDO_DETAIL,
             )
 
-        # Busca TODAS as orders com o mesmo codigo_pacote (todas as owners)
-        orders_mesmo_codigo = db.execute(
-            select(Order).where(Order.codigo_pacote == payload.codigo_pacote)
-        ).scalars().all()
-
-        if not orders_mesmo_codigo:
-            # em teoria não deveria acontecer, pois já temos 'order' acima
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Nenhuma order encontrada com esse codigo_pacote.",
-            )
-
-        for o in orders_mesmo_codigo:
-            o.status = 4
-            o.atualizado_em = agora
-
-            # apenas na order do owner atual gravamos o entregador
-            if o.owner_id == owner_id:
-                o.user_id = payload.user_id
-
-            novo_evento = OrderEvent(
-                order_id=o.order_id,
-                tipo=4,
-                actor_user_id=current_user.user_id,
-                payload=None,
-                data_hora=agora,
-                owner_id=o.owner_id,
-            )
-            db.add(novo_evento)
-
-        db.commit()
-        db.refresh(order)  # atualiza a order principal desse owner
-        return order
+        # Todas as orders do código vão para status 5 com user_id = current_user,
+        # e um evento por order na mesma transação
+        atualizadas = await marcar_entregues(
+            db, [o.order_id for o in orders_mesmo_codigo], current_user.user_id, agora
+        )
+        await gravar_eventos(db, eventos_entrega(atualizadas, current_user.user_id, agora))
 
-    # -------------------------
-    # OUTROS STATUS NÃO SUPORTADOS
-    # -------------------------
-    raise HTTPException(
-        status_code=status.HTTP_400_BAD_REQUEST,
-        detail=f"Status atual {order.status} não permite este PATCH.",
-    )
+    # Order principal: a do owner atual (garantida pelo EXISTS)
+    order_principal = next(o for o in atualizadas if o.owner_id == owner_id)
+    return order_json_response(order_principal)
 
 
-# =========================================================
-# PATCH - REGISTRO DE ENTREGA (2 ➜ 5 OU 4 ➜ 5)
-# =========================================================
 @router.patch(
-    "/registro-entrega",
-    response_model=OrderOut,
+    "/registro-entrega/batch",
+    response_model=List[OrderOut],
     status_code=status.HTTP_200_OK,
-    summary="Registra a entrega (status 5) e propaga para todos os owners do mesmo código",
+    summary="Registra a entrega (status 5) de vários códigos numa só transação",
 )
-def registro_entrega(
-    payload: RegistroEntregaPayload,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+async def registro_entrega_batch(
+    payload: BatchRegistroEntregaPayload,
+    current_user: CurrentUser = Depends(require_entregador),
+    db: AsyncSession = Depends(get_async_db_do_owner),
 ):
-    owner_id = current_user.owner_id
-
-    if (current_user.tipo or "").upper() != "ENTREGADOR":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Apenas usuários ENTREGADOR podem registrar entrega.",
-        )
+    """
+    Mesmas regras do /registro-entrega para cada código, com um SELECT, um
+    UPDATE e um INSERT de eventos para o lote inteiro. Tudo ou nada: se
+    algum código não puder ser entregue, nenhum é alterado.
 
+    Devolve a order principal (a do owner atual) de cada código, na ordem
+    recebida.
+    """
+    owner_id = current_user.owner_id
     agora = datetime.now(br_tz)
-
-    # Buscar todas as orders do código
-    orders_mesmo_codigo = db.execute(
-        select(Order).where(Order.codigo_pacote == payload.codigo_pacote)
-    ).scalars().all()
-
-    if not orders_mesmo_codigo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhuma order encontrada com esse codigo_pacote."
+    codigos = payload.codigos  # já sem repetidos (validator do payload)
+
+    async with db.begin():
+        # códigos que o owner do entregador também tem (mesma regra do EXISTS
+        # do endpoint unitário); as linhas de todos os owners desses códigos
+        codigos_do_owner = (
+            select(Order.codigo_pacote)
+            .where(Order.owner_id == owner_id)
+            .where(Order.codigo_pacote.in_(codigos))
         )
+        linhas = (await db.execute(
+            select(Order.order_id, Order.owner_id, Order.codigo_pacote, Order.status)
+            .where(Order.codigo_pacote.in_(codigos_do_owner))
+        )).all()
 
-    # Verifica se existe pelo menos uma em status 2 OU 4
-    if not any(o.status in (2, 4) for o in orders_mesmo_codigo):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Entrega só pode ser registrada se alguma linha estiver em status 2 ou 4."
-        )
+        por_codigo: dict[str, List[Row]] = {}
+        for o in linhas:
+            por_codigo.setdefault(o.codigo_pacote, []).append(o)
 
-    # Order principal: usa a do owner atual se existir, senão a primeira
-    order_principal = next(
-        (o for o in orders_mesmo_codigo if o.owner_id == owner_id),
-        orders_mesmo_codigo[0]
-    )
+        nao_encontrados = [c for c in codigos if c not in por_codigo]
+        if nao_encontrados:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Nenhuma order encontrada para: {', '.join(nao_encontrados)}.",
+            )
 
-    # Atualizar todas as orders para status 5 e amarrar user_id = current_user
-    for o in orders_mesmo_codigo:
-        o.status = 5
-        o.atualizado_em = agora
-        o.user_id = current_user.user_id   # AGORA É SEMPRE current_user
+        sem_status = [
+            c for c in codigos
+            if not any(o.status in (2, 4) for o in por_codigo[c])
+        ]
+        if sem_status:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{ENTREGA_STATUS_INVALIDO_DETAIL} Códigos: {', '.join(sem_status)}.",
+            )
 
-        novo_evento = OrderEvent(
-            order_id=o.order_id,
-            tipo=5,
-            actor_user_id=current_user.user_id,  # SEMPRE current_user
-            payload=None,
-            data_hora=agora,
-            owner_id=o.owner_id,
+        atualizadas = await marcar_entregues(
+            db, [o.order_id for o in linhas], current_user.user_id, agora
         )
-        db.add(novo_evento)
+        await gravar_eventos(db, eventos_entrega(atualizadas, current_user.user_id, agora))
 
-    db.commit()
-    db.refresh(order_principal)
+    principais: dict[str, Row] = {}
+    for o in atualizadas:
+        if o.owner_id == owner_id:
+            principais.setdefault(o.codigo_pacote, o)
 
-    return order_principal
+    return ORJSONResponse([order_out_dict(principais[c]) for c in codigos])
 
 # =========================================================
-# GET - LISTAR TODOS
+# GET - LISTAR (PAGINADO)
 # =========================================================
-@router.get("/", response_model=List[OrderOut])
-def listar_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+@router.get("/", response_model=OrderPage)
+async def listar_orders(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="order_id do último item da página anterior"),
+    db: AsyncSession = Depends(get_async_db_do_owner),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
     owner_id = current_user.owner_id
 
-    results = db.execute(
-        select(Order).where(Order.owner_id == owner_id)
-    ).scalars().all()
+    # Rows só com as colunas do OrderOut, sem objetos ORM
+    stmt = (
+        select(*ORDER_OUT_COLUMNS)
+        .where(Order.owner_id == owner_id)
+        .order_by(Order.order_id.desc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        stmt = stmt.where(Order.order_id < cursor)
+
+    results = (await db.execute(stmt)).all()
+    next_cursor = results[-1].order_id if len(results) == limit else None
 
-    return results
+    # as colunas já são exatamente os campos do OrderOut: os dicts das Rows
+    # vão direto para o orjson, sem instanciar modelos Pydantic por linha.
+    # Devolvendo Response o FastAPI não revalida contra o response_model.
+    return ORJSONResponse(
+        {"items": [r._asdict() for r in results], "next_cursor": next_cursor}
+    )
 
 
 # =========================================================
 # GET - POR ID
 # =========================================================
 @router.get("/{order_id}", response_model=OrderOut)
-def obter_order(
+async def obter_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+    db: AsyncSession = Depends(get_async_db_do_owner),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
     owner_id = current_user.owner_id
 
-    order = db.execute(
+    order = (await db.execute(
         select(Order)
+        .options(*ORDER_OUT_LOAD)
         .where(Order.owner_id == owner_id)
         .where(Order.order_id == order_id)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
 
     if not order:
         raise HTTPException(status_code=404, detail="Order não encontrado.")
 
-    return order
+    return order_json_response(order)
+
+
+# eventos de uma order como array JSON montado no Postgres (json_agg), em
+# ordem cronológica; order sem eventos vira [] em vez de [null]
+EVENTOS_JSON = func.coalesce(
+    func.json_agg(
+        aggregate_order_by(
+            func.json_build_object(
+                "event_id", OrderEvent.event_id,
+                "tipo", OrderEvent.tipo,
+                "actor_user_id", OrderEvent.actor_user_id,
+                "data_hora", OrderEvent.data_hora,
+            ),
+            OrderEvent.data_hora,
+        )
+    ).filter(OrderEvent.event_id.isnot(None)),
+    literal_column("'[]'::json"),
+).label("events")
+
+
+@router.get("/{order_id}/eventos", response_model=OrderComEventosOut)
+async def obter_order_com_eventos(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_db_do_owner),
+    current_user: CurrentUser = Depends(get_current_user_v3),
+):
+    """
+    Order + eventos num único SELECT (LEFT JOIN + GROUP BY + json_agg): o
+    Postgres já devolve os eventos aninhados, sem segunda chamada nem
+    montagem em Python.
+    """
+    owner_id = current_user.owner_id
+
+    linha = (await db.execute(
+        select(*ORDER_OUT_COLUMNS, EVENTOS_JSON)
+        .outerjoin(OrderEvent, OrderEvent.order_id == Order.order_id)
+        .where(Order.owner_id == owner_id)
+        .where(Order.order_id == order_id)
+        .group_by(Order.order_id)
+    )).first()
+
+    if linha is None:
+        raise HTTPException(status_code=404, detail="Order não encontrado.")
+
+    return ORJSONResponse(linha._asdict())
 
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import boto3
+from botocore.config import Config
 from uuid import uuid4
 import certifi  # usamos pra validar SSL de forma correta
 
@@ -18,16 +19,32 @@ B2_BUCKET_NAME = "tracking-saidas-pictures"        # <- nome do bucket
 B2_ENDPOINT = "https://s3.us-west-004.backblazeb2.com"  # <- endpoint S3 da sua região
 B2_REGION = "us-west-004"                          # <- só a região
 
-# cria o client S3 apontando para o Backblaze
+# validade da URL de upload (segundos)
+PRESIGN_EXPIRES_IN = 300
+
+# caminho do bundle de CAs resolvido uma vez no import
+CA_BUNDLE = certifi.where()
+
+# SigV4 e path-style explícitos (o final_url abaixo também é path-style);
+# pool de conexões keep-alive compartilhado por todas as chamadas do client
+S3_CONFIG = Config(
+    signature_version="s3v4",
+    s3={"addressing_style": "path"},
+    max_pool_connections=50,
+    retries={"max_attempts": 2, "mode": "standard"},
+)
+
+# cria o client S3 apontando para o Backblaze (um só, reaproveitado)
 # (se no seu Windows der aquele erro de certificado, você pode trocar
-# verify=certifi.where() por verify=False só no ambiente local)
+# verify=CA_BUNDLE por verify=False só no ambiente local)
 s3_client = boto3.client(
     "s3",
     endpoint_url=B2_ENDPOINT,
     aws_access_key_id=B2_KEY_ID,
     aws_secret_access_key=B2_APP_KEY,
     region_name=B2_REGION,
-    verify=certifi.where(),
+    verify=CA_BUNDLE,
+    config=S3_CONFIG,
 )
 
 # =========================================================
@@ -80,15 +97,18 @@ def gerar_url_upload(dados: PresignRequest):
     else:
         key = f"uploads/{uuid4()}.{ext}"
 
+    # Sem cache de URL: cada upload ganha uma key nova (uuid4), então uma URL
+    # assinada nunca é pedida duas vezes. Reaproveitar a URL faria dois
+    # uploads gravarem no mesmo objeto. A assinatura é só HMAC local.
     try:
-        # gera uma URL de PUT válida por 5 minutos (300s)
+        # gera uma URL de PUT válida por PRESIGN_EXPIRES_IN (5 minutos)
         presigned_url = s3_client.generate_presigned_url(
             "put_object",
             Params={
                 "Bucket": B2_BUCKET_NAME,
                 "Key": key,
             },
-            ExpiresIn=300,
+            ExpiresIn=PRESIGN_EXPIRES_IN,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar URL: {e}")
@@ -100,7 +120,7 @@ def gerar_url_upload(dados: PresignRequest):
         "upload_url": presigned_url,  # o front faz PUT aqui
         "final_url": final_url,       # o front pode salvar no back depois
         "key": key,                   # caminho interno no bucket
-        "expires_in": 300,
+        "expires_in": PRESIGN_EXPIRES_IN,
     }
 
 
@@ -1,21 +1,50 @@
 from __future__ import annotations
+import asyncio
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 
-br_tz = pytz.timezone("America/Sao_Paulo")
+br_tz = ZoneInfo("America/Sao_Paulo")
 
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db
 from models import Owner, User
-from auth_routes import get_current_user_v3, get_password_hash  # <-- usa o auth v3
+from auth_routes import CurrentUser, get_async_db_do_owner, get_current_user_v3, get_password_hash  # <-- usa o auth v3
 
 
 router = APIRouter(prefix="/v3/users", tags=["Users v3"])
 
+# índices UNIQUE de mt.users -> mensagem devolvida em caso de duplicidade
+USER_UNIQUE_CONSTRAINTS = {
+    "ix_users_username": "Username já existe.",
+    "ix_users_email": "Email já cadastrado.",
+}
+
+
+async def inserir_usuario(db: AsyncSession, stmt) -> User:
+    """
+    Executa o INSERT em mt.users (com RETURNING User) e commita. A unicidade
+    de username/email fica com o banco (sem corrida entre checagem e
+    insert): violação vira 400, qualquer outro IntegrityError sobe
+    normalmente.
+    """
+    try:
+        user = (await db.scalars(stmt)).one()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+        detail = USER_UNIQUE_CONSTRAINTS.get(constraint)
+        if detail is None:
+            raise
+        raise HTTPException(status_code=400, detail=detail)
+    return user
+
 
 # =========================================================
 # SCHEMAS COMUNS
@@ -108,33 +137,41 @@ class CreateEntregadorResponse(BaseModel):
     status_code=status.HTTP_201_CREATED,
     summary="Cria um OWNER (BASE) e um USER ADMIN vinculado",
 )
-def create_owner_and_admin(
+async def create_owner_and_admin(
     payload: CreateUserRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
 
     now = datetime.now(br_tz)
+    u = payload.user
 
-    # Cria OWNER (tipo_empresa = EMPRESA)
-    owner = Owner(
+    # bcrypt é CPU puro: roda numa thread para não travar o event loop, e
+    # antes do primeiro comando no banco, para a conexão/transação não
+    # ficar presa durante o hash
+    hashed = await asyncio.to_thread(get_password_hash, u.password_hash)
+
+    # Cria OWNER (tipo_empresa = BASE) e USER ADMIN vinculado num único
+    # comando: o INSERT do owner vai numa CTE com RETURNING id_owner e o
+    # INSERT do user lê o id dela
+    #   WITH novo_owner AS (INSERT INTO mt.owner ... RETURNING id_owner)
+    #   INSERT INTO mt.users (owner_id, ...)
+    #   VALUES ((SELECT id_owner FROM novo_owner), ...) RETURNING ...
+    owner_valores = dict(
         nome_empresa=payload.owner.nome_empresa,
         tipo_empresa="BASE",
         documento_empresa=payload.owner.documento_empresa,
         email_contato=payload.owner.email_contato,
         telefone_empresa=payload.owner.telefone_empresa,
-        criado_em=now,
-        atualizado_em=now,
     )
-    db.add(owner)
-    db.flush()  # garante que owner.id_owner foi preenchido
-
-    # Cria USER ADMIN vinculado a esse OWNER
-    u = payload.user
-
-    hashed = get_password_hash(u.password_hash)
+    novo_owner = (
+        insert(Owner)
+        .values(**owner_valores, criado_em=now, atualizado_em=now)
+        .returning(Owner.id_owner)
+        .cte("novo_owner")
+    )
 
-    user = User(
-        owner_id=owner.id_owner,
+    stmt = insert(User).values(
+        owner_id=select(novo_owner.c.id_owner).scalar_subquery(),
         nome=u.nome,
         email=u.email,
         username=u.username,
@@ -154,12 +191,12 @@ def create_owner_and_admin(
         endereco_cep=u.endereco_cep,
         criado_em=now,
         atualizado_em=now,
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(owner)
-    db.refresh(user)
+    ).add_cte(novo_owner).returning(User)
+
+    user = await inserir_usuario(db, stmt)
 
+    # o owner não volta como objeto: o id vem do user, o resto do payload
+    owner = OwnerOut(id_owner=user.owner_id, **owner_valores)
     return CreateUserResponse(owner=owner, user=user)
 
 
@@ -172,10 +209,10 @@ def create_owner_and_admin(
     status_code=status.HTTP_201_CREATED,
     summary="Cria um ENTREGADOR vinculado ao mesmo owner do usuário logado",
 )
-def create_entregador(
+async def create_entregador(
     payload: EntregadorCreatePayload,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_v3),
+    db: AsyncSession = Depends(get_async_db_do_owner),
+    current_user: CurrentUser = Depends(get_current_user_v3),
 ):
     """
     - Descobre quem enviou o POST via get_current_user_v3
@@ -193,10 +230,10 @@ def create_entregador(
         )
 
     now = datetime.now(br_tz)
-    # Hash da senha
-    hashed = get_password_hash(payload.password_hash)
+    # Hash da senha (numa thread, antes de qualquer acesso ao banco)
+    hashed = await asyncio.to_thread(get_password_hash, payload.password_hash)
 
-    new_user = User(
+    stmt = insert(User).values(
         owner_id=current_user.owner_id,
         nome=payload.nome,
         email=payload.email,
@@ -217,10 +254,8 @@ def create_entregador(
         endereco_cep=payload.endereco_cep,
         criado_em=now,
         atualizado_em=now,
-    )
+    ).returning(User)
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    new_user = await inserir_usuario(db, stmt)
 
     return CreateEntregadorResponse(user=new_user)